@@ -0,0 +1,168 @@
+"""Двухуровневый кэш: память процесса перед общим для всех процессов.
+
+Первый уровень — `LocMemCache` с вытеснением давно не читанных
+записей, второй — любой бэкенд из `CACHES` (файлы, Redis), имя которого
+задаёт опция `SHARED`. Запись идёт в оба уровня сразу, а рядом
+со значением во втором уровне лежит метка записи — случайная строка,
+своя у каждой записи. Копия в памяти процесса хранит метку, с которой
+была прочитана, и не чаще раза в `POLL_INTERVAL` секунд сверяет её
+с общей: если ключ изменили, удалили или весь кэш очистили, метки
+не совпадут, и значение перечитается. Так чужая запись видна
+с задержкой не больше этого интервала, а общий счётчик, которому
+нужен атомарный `incr`, не требуется.
+"""
+import threading
+import uuid
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+STAMP_KEY = 'core:cache:stamp:{}'
+# Пока этот ключ есть в памяти процесса, метку не сверяем.
+CHECKED_KEY = 'core:cache:checked:{}'
+
+_MISSING = object()
+_states = {}
+_states_lock = threading.Lock()
+
+
+class _ProcessState:
+    """Общее для потоков процесса состояние одного кэша."""
+
+    def __init__(self):
+        self.stats = Counter()
+
+
+def _get_state(name):
+    with _states_lock:
+        return _states.setdefault(name, _ProcessState())
+
+
+def _new_stamp():
+    return uuid.uuid4().hex
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.name = location or 'tiered'
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self.poll_interval = options.get('POLL_INTERVAL', 1)
+        self.local = LocMemCache(f'{self.name}:local', {
+            'TIMEOUT': self.local_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000)},
+        })
+        self.state = _get_state(self.name)
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def _remember(self, key, stamp, value, timeout, version):
+        self.local.set(key, (stamp, value), timeout, version)
+        self.local.set(CHECKED_KEY.format(key), True, self.poll_interval,
+                       version)
+
+    def _local_get(self, key, version):
+        """Значение из памяти процесса, если его метка ещё актуальна."""
+        entry = self.local.get(key, _MISSING, version)
+        if entry is _MISSING:
+            return _MISSING
+        stamp, value = entry
+        checked = CHECKED_KEY.format(key)
+        if self.local.get(checked, False, version):
+            return value
+        if self.shared.get(STAMP_KEY.format(key), None, version) != stamp:
+            self.state.stats['invalidations'] += 1
+            self.local.delete(key, version)
+            return _MISSING
+        self.local.set(checked, True, self.poll_interval, version)
+        return value
+
+    def get(self, key, default=None, version=None):
+        value = self._local_get(key, version)
+        if value is not _MISSING:
+            self.state.stats['local_hits'] += 1
+            return value
+        self.state.stats['local_misses'] += 1
+        # Метку читаем раньше значения: если между чтениями ключ
+        # перезапишут, копия устареет и перечитается при сверке.
+        stamp = self.shared.get(STAMP_KEY.format(key), None, version)
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            self.state.stats['shared_misses'] += 1
+            return default
+        self.state.stats['shared_hits'] += 1
+        if stamp is not None:
+            self._remember(key, stamp, value, self.local_timeout, version)
+        return value
+
+    def _write_stamp(self, key, timeout, version):
+        stamp = _new_stamp()
+        self.shared.set(STAMP_KEY.format(key), stamp, timeout, version)
+        return stamp
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        stamp = self._write_stamp(key, timeout, version)
+        self._remember(key, stamp, value, self._local_timeout(timeout),
+                       version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout, version):
+            return False
+        stamp = self._write_stamp(key, timeout, version)
+        self._remember(key, stamp, value, self._local_timeout(timeout),
+                       version)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.touch(STAMP_KEY.format(key), timeout, version)
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        self.shared.delete(STAMP_KEY.format(key), version)
+        self.local.delete(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        # Срок жизни счётчика неизвестен, метка живёт не меньше него.
+        stamp = self._write_stamp(key, None, version)
+        self._remember(key, stamp, value, self.local_timeout, version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def clear(self):
+        # Вместе со вторым уровнем пропадают и метки, поэтому другие
+        # процессы перечитают свои копии при ближайшей сверке.
+        self.shared.clear()
+        self.local.clear()
+
+    def tier_stats(self):
+        """Попадания и промахи по уровням с начала работы процесса."""
+        stats = dict(self.state.stats)
+        result = {'invalidations': stats.get('invalidations', 0)}
+        for tier in ('local', 'shared'):
+            hits = stats.get(f'{tier}_hits', 0)
+            misses = stats.get(f'{tier}_misses', 0)
+            result[tier] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 3)
+                if hits + misses else None,
+            }
+        return result
@@ -1,9 +1,18 @@
 import datetime as dt
+import time
+
+# Год и момент, когда он сменится, общие для всех запросов процесса.
+_current = {'year': None, 'until': 0.0}
 
 
 def year(request):
-    """Добавляет переменную с текущим годом."""
-    year = dt.datetime.now().year
-    return {
-        'year': year
-    }
+    """Добавляет переменную с текущим годом.
+
+    Год вычисляется один раз на процесс и заново только после того,
+    как наступит следующий.
+    """
+    if time.time() >= _current['until']:
+        now = dt.datetime.now()
+        _current['year'] = now.year
+        _current['until'] = dt.datetime(now.year + 1, 1, 1).timestamp()
+    return {'year': _current['year']}
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core import sessions
+
+
+class Command(BaseCommand):
+    help = ('Удаляет просроченные сессии из базы небольшими пачками, '
+            'не блокируя таблицу надолго')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=sessions.PURGE_BATCH_SIZE,
+            help='Сколько строк удалять одним запросом'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Пауза между пачками в секундах'
+        )
+
+    def handle(self, *args, **options):
+        deleted = sessions.purge_expired(options['batch_size'],
+                                         options['pause'])
+        self.stdout.write(f'Сессий удалено: {deleted}')
@@ -0,0 +1,195 @@
+"""Сбор показателей производительности запросов.
+
+Показатели копятся в памяти процесса: для каждой вьюхи хранится
+окно последних `PERF_WINDOW` замеров, по нему считаются перцентили.
+Для шаблонов копится число рендеров, из них через `{% include %}`,
+и суммарное время с вложенными шаблонами.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.base import Template
+from django.utils.module_loading import import_string
+
+FIELDS = ('total', 'db', 'queries', 'template', 'cache_hits', 'cache_misses')
+PERCENTILES = (50, 95, 99)
+
+_local = threading.local()
+_samples = defaultdict(lambda: deque(maxlen=settings.PERF_WINDOW))
+_samples_lock = threading.Lock()
+# Имя шаблона -> [рендеры, из них вложенные, секунды].
+_templates = defaultdict(lambda: [0, 0, 0.0])
+_installed = False
+_MISSING = object()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.template_depth = 0
+        self.includes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in FIELDS)
+
+    def server_timing(self):
+        return ', '.join((
+            f'total;dur={self.total * 1000:.1f}',
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template * 1000:.1f};'
+            f'desc="{self.includes} includes"',
+            f'cache;desc="hits={self.cache_hits} misses={self.cache_misses}"',
+        ))
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+def current():
+    """Показатели текущего запроса, если он попал в выборку."""
+    return getattr(_local, 'metrics', None)
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def stop():
+    _local.metrics = None
+
+
+def _instrument_template_render(render):
+    @wraps(render)
+    def timed_render(self, context):
+        metrics = current()
+        if metrics is None:
+            return render(self, context)
+        included = metrics.template_depth > 0
+        metrics.includes += included
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.template_depth -= 1
+            # Вложенные шаблоны ({% include %}) уже учтены во внешнем.
+            if not included:
+                metrics.template += elapsed
+            _record_template(self.origin.template_name or self.origin.name,
+                             included, elapsed)
+    return timed_render
+
+
+def _record_template(name, included, elapsed):
+    with _samples_lock:
+        stats = _templates[name]
+        stats[0] += 1
+        stats[1] += included
+        stats[2] += elapsed
+
+
+def _instrument_cache_get(get):
+    @wraps(get)
+    def counted_get(self, key, default=None, version=None):
+        metrics = current()
+        if metrics is None:
+            return get(self, key, default, version)
+        value = get(self, key, _MISSING, version)
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+    return counted_get
+
+
+def install():
+    """Один раз оборачивает рендер шаблонов и чтение из кэша."""
+    global _installed
+    if _installed:
+        return
+    Template.render = _instrument_template_render(Template.render)
+    # Только кэш по умолчанию: внутренние уровни многоуровневого кэша
+    # посчитали бы одно чтение несколько раз.
+    backend = import_string(settings.CACHES['default']['BACKEND'])
+    backend.get = _instrument_cache_get(backend.get)
+    _installed = True
+
+
+def record(view_name, metrics):
+    with _samples_lock:
+        _samples[view_name].append(metrics.as_tuple())
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга по отсортированным значениям."""
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+def summary():
+    """Перцентили по каждой вьюхе; время в миллисекундах."""
+    with _samples_lock:
+        snapshot = {view: list(samples) for view, samples in _samples.items()}
+    result = {}
+    for view, samples in sorted(snapshot.items()):
+        stats = {'count': len(samples)}
+        for position, field in enumerate(FIELDS):
+            values = sorted(sample[position] for sample in samples)
+            scale = 1000 if field in ('total', 'db', 'template') else 1
+            stats[field] = {
+                f'p{percent}': round(percentile(values, percent) * scale, 2)
+                for percent in PERCENTILES
+            }
+        result[view] = stats
+    return result
+
+
+def template_summary():
+    """Рендеры шаблонов с самого долгого; время в миллисекундах."""
+    with _samples_lock:
+        snapshot = {name: list(stats) for name, stats in _templates.items()}
+    ordered = sorted(snapshot.items(), key=lambda item: -item[1][2])
+    return {
+        name: {
+            'renders': renders,
+            'includes': includes,
+            'total': round(seconds * 1000, 2),
+            'mean': round(seconds * 1000 / renders, 3),
+        }
+        for name, (renders, includes, seconds) in ordered
+    }
+
+
+def reset():
+    with _samples_lock:
+        _samples.clear()
+        _templates.clear()
+
+
+def cache_stats():
+    """Попадания по уровням для кэшей, которые их считают."""
+    return {
+        alias: caches[alias].tier_stats() for alias in settings.CACHES
+        if hasattr(caches[alias], 'tier_stats')
+    }
@@ -0,0 +1,78 @@
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+STICKY_COOKIE = 'use_primary'
+READ_METHODS = ('GET', 'HEAD')
+
+
+class PerformanceMiddleware:
+    """Замеряет время, запросы к БД, рендер шаблонов и работу кэша.
+
+    В выборку попадает доля запросов `PERF_SAMPLE_RATE`, остальные
+    проходят без накладных расходов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.install()
+
+    def __call__(self, request):
+        if random.random() >= settings.PERF_SAMPLE_RATE:
+            return self.get_response(request)
+        request_metrics = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        request_metrics.query_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        request_metrics.finish()
+        if request.resolver_match is not None:
+            metrics.record(request.resolver_match.view_name, request_metrics)
+        response['Server-Timing'] = request_metrics.server_timing()
+        return response
+
+
+class ReplicaMiddleware:
+    """Включает чтение из реплик для вьюх из `REPLICA_VIEWS`.
+
+    После записи во вьюхе не из `REPLICA_VIEWS` ставит cookie (метод
+    не важен: подписка, например, оформляется GET-запросом), и до её
+    истечения запросы пользователя читают из основной базы. Служебные
+    записи читающих вьюх (счётчики, очередь миниатюр) cookie не ставят,
+    иначе почти каждый аноним читал бы из основной базы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        try:
+            response = self.get_response(request)
+            if routers.wrote() and not _is_replica_view(request):
+                response.set_cookie(STICKY_COOKIE, '1',
+                                    max_age=settings.REPLICA_STICKY_SECONDS,
+                                    httponly=True)
+        finally:
+            routers.reset()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routers.use_replica(
+            request.method in READ_METHODS
+            and STICKY_COOKIE not in request.COOKIES
+            and _is_replica_view(request)
+        )
+
+
+def _is_replica_view(request):
+    match = request.resolver_match
+    return match is not None and match.view_name in settings.REPLICA_VIEWS
@@ -0,0 +1,49 @@
+"""Маршрутизация чтения на реплики базы данных.
+
+Запросы к вьюхам из `REPLICA_VIEWS` читают из случайной реплики
+`DATABASE_REPLICAS`, всё остальное и любая запись идут в основную
+базу. После записи пользователь `REPLICA_STICKY_SECONDS` читает
+из основной базы, чтобы сразу видеть свои изменения, пока реплики
+их догоняют.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_local = threading.local()
+
+
+def reset():
+    """Начало запроса: чтение из основной базы, записей не было."""
+    _local.replica = False
+    _local.wrote = False
+
+
+def use_replica(enabled):
+    """Разрешает или запрещает чтение из реплик в текущем потоке."""
+    _local.replica = enabled
+
+
+def wrote():
+    """Была ли запись в базу с начала текущего запроса."""
+    return getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if wrote() or not getattr(_local, 'replica', False):
+            return PRIMARY
+        if not settings.DATABASE_REPLICAS:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики хранят те же строки, что и основная база.
+        return True
@@ -0,0 +1,109 @@
+"""Сессии: кэш перед базой и подписанная cookie для анонимов.
+
+Движок (`SESSION_ENGINE = 'core.sessions'`) основан на `cached_db`:
+сессия читается из кэша `SESSION_CACHE_ALIAS` (двухуровневый кэш
+с памятью процесса), а база нужна только при промахе. Запись идёт
+сквозь кэш в базу, но пропускается, если данные не изменились.
+Сессию без вошедшего пользователя при `SESSION_ANONYMOUS_SIGNED_COOKIE`
+не пишем в базу вовсе: её данные хранятся в самой подписанной cookie.
+Просроченные строки удаляются пачками (`purge_expired`), чтобы
+не блокировать таблицу одним большим DELETE.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.cached_db import \
+    SessionStore as CachedDBStore
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.utils import timezone
+
+SIGNED_SALT = 'django.contrib.sessions.backends.signed_cookies'
+# Больше — в базу: браузеры ограничивают cookie 4 КБ.
+SIGNED_MAX_LENGTH = 2048
+PURGE_BATCH_SIZE = 1000
+
+
+def is_signed(session_key):
+    # Ключи сессий в базе состоят из букв и цифр, а подписанные
+    # данные всегда содержат разделитель.
+    return bool(session_key) and ':' in session_key
+
+
+class SessionStore(CachedDBStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded = None
+
+    def load(self):
+        if is_signed(self.session_key):
+            data = self._load_signed()
+        else:
+            data = super().load()
+        self._loaded = self.serializer().dumps(data)
+        return data
+
+    def _load_signed(self):
+        try:
+            return signing.loads(
+                self.session_key, salt=SIGNED_SALT,
+                serializer=self.serializer,
+                max_age=settings.SESSION_COOKIE_AGE)
+        except signing.BadSignature:
+            self._session_key = None
+            return {}
+
+    def exists(self, session_key):
+        if is_signed(session_key):
+            return False
+        return super().exists(session_key)
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        if self._save_signed(data):
+            return
+        if is_signed(self.session_key):
+            # Пользователь вошёл: сессия переезжает в базу под новым ключом.
+            self._session_key = None
+        elif (not must_create and self._loaded is not None
+              and self.serializer().dumps(data) == self._loaded):
+            return
+        super().save(must_create)
+        self._loaded = self.serializer().dumps(data)
+
+    def _save_signed(self, data):
+        if (not settings.SESSION_ANONYMOUS_SIGNED_COOKIE
+                or SESSION_KEY in data):
+            return False
+        value = signing.dumps(data, salt=SIGNED_SALT,
+                              serializer=self.serializer, compress=True)
+        if len(value) > SIGNED_MAX_LENGTH:
+            return False
+        if self.session_key and not is_signed(self.session_key):
+            self.delete(self.session_key)
+        self._session_key = value
+        return True
+
+    def delete(self, session_key=None):
+        if is_signed(session_key or self.session_key):
+            return
+        super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        purge_expired()
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE, pause=0):
+    """Удаляет просроченные сессии пачками, возвращает их число."""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        keys = list(Session.objects.filter(expire_date__lt=now).values_list(
+            'pk', flat=True)[:batch_size])
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(pk__in=keys).delete()[0]
+        if pause:
+            time.sleep(pause)
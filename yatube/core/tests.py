@@ -1,7 +1,347 @@
-from django.test import TestCase
+import asyncio
+import datetime as dt
+import shutil
+import tempfile
+import time
+from io import StringIO
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Engine
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from core import metrics, routers
+from core import sessions
+from core.asgi import WsgiToAsgi
+from core.cache import CHECKED_KEY, TieredCache
+from core.context_processors import year
+from core.middleware import STICKY_COOKIE, ReplicaMiddleware
+from posts import follow_graph
+from posts.models import Follow, Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
     def test_error_page(self):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class YearContextProcessorTest(TestCase):
+    def tearDown(self):
+        year._current['until'] = 0.0
+
+    def test_year_is_computed_once_until_it_changes(self):
+        year._current['until'] = 0.0
+        self.assertEqual(year.year(None), {'year': dt.datetime.now().year})
+        next_year = dt.datetime(dt.datetime.now().year + 1, 1, 1)
+        self.assertEqual(year._current['until'], next_year.timestamp())
+        year._current.update(year=1999, until=time.time() + 60)
+        self.assertEqual(year.year(None), {'year': 1999})
+
+    def test_anonymous_page_context_without_queries(self):
+        # Пользователь и сессия ленивые: без cookie сессии в базу
+        # не нужно ходить даже ради шапки и подвала.
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('about:author'))
+        self.assertContains(response, f'© {dt.datetime.now().year}')
+
+
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    @override_settings(PERF_SAMPLE_RATE=1)
+    def test_sampled_request_has_server_timing(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('posts:index', metrics.summary())
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(metrics.summary(), {})
+
+    @override_settings(PERF_SAMPLE_RATE=1)
+    def test_stats_only_for_staff(self):
+        url = reverse('core:performance_stats')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('posts:index'))
+        stats = self.client.get(url).json()
+        self.assertEqual(stats['posts:index']['count'], 1)
+        self.assertEqual(set(stats['posts:index']['total']),
+                         {'p50', 'p95', 'p99'})
+
+
+class TemplateProfilingTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+        cache.clear()
+
+    @override_settings(PERF_SAMPLE_RATE=1)
+    def test_template_renders_and_includes(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}') for number in range(3))
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('includes"', response['Server-Timing'])
+        stats = metrics.template_summary()
+        self.assertEqual(stats['posts/index.html']['renders'], 1)
+        self.assertEqual(stats['posts/index.html']['includes'], 0)
+        self.assertEqual(stats['includes/header.html']['includes'], 1)
+        # Карточки вставлены в index.html при компиляции.
+        self.assertNotIn('posts/includes/post.html', stats)
+
+    def test_partial_with_cached_loader(self):
+        templates = {
+            'list.html': ("{% load partials %}{% for item in items %}"
+                          "{% partial 'item.html' %}{% endfor %}"),
+            'item.html': '<li>{{ item }}</li>',
+        }
+        engine = Engine(
+            libraries={'partials': 'core.templatetags.partials'},
+            loaders=[('django.template.loaders.cached.Loader',
+                      [('django.template.loaders.locmem.Loader',
+                        templates)])],
+        )
+        template = engine.get_template('list.html')
+        templates['item.html'] = 'изменён'
+        # Вставленный шаблон скомпилирован вместе с родительским.
+        self.assertEqual(template.render(Context({'items': [1, 2]})),
+                         '<li>1</li><li>2</li>')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TestCase):
+    """Основная база и реплика — два разных файла SQLite без репликации,
+    поэтому по содержимому ответа видно, откуда читала вьюха."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        Post.objects.create(author=self.user, text='Только в основной базе')
+        self.client.force_login(self.user)
+
+    def test_read_views_use_replica(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Только в основной базе')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_other_views_use_primary(self):
+        response = self.client.get(reverse('posts:post_create'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_reads_stick_to_primary_after_write(self):
+        response = self.client.post(reverse('posts:post_create'),
+                                    data={'text': 'Новый пост'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый пост')
+        self.assertEqual(Post.objects.using('replica').count(), 0)
+
+    def test_writing_get_view_sticks(self):
+        author = User.objects.create_user(username='other')
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[author.username]))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response = self.client.get(
+            reverse('posts:profile', args=[author.username]))
+        self.assertTrue(response.context['following'])
+
+    def test_follow_graph_is_filled_from_primary(self):
+        author = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=author)
+        routers.reset()
+        routers.use_replica(True)
+        self.addCleanup(routers.reset)
+        self.assertTrue(follow_graph.is_following(self.user.pk, author.pk))
+
+    def test_writes_in_read_views_do_not_stick(self):
+        def get_response(request):
+            Post.objects.create(author=self.user, text='Служебная запись')
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        request = RequestFactory().get(reverse('posts:index'))
+        request.resolver_match = resolve(request.path)
+        self.assertNotIn(STICKY_COOKIE, middleware(request).cookies)
+        request = RequestFactory().get(reverse('posts:post_create'))
+        request.resolver_match = resolve(request.path)
+        self.assertIn(STICKY_COOKIE, middleware(request).cookies)
+
+
+class TieredCacheTest(TestCase):
+    """Два экземпляра с разной памятью и общим файловым кэшем
+    изображают два процесса."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shared = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }
+        override = override_settings(
+            CACHES=dict(settings.CACHES, tiered_shared=shared))
+        override.enable()
+        self.addCleanup(override.disable)
+        options = {'OPTIONS': {'SHARED': 'tiered_shared',
+                               'POLL_INTERVAL': 0}}
+        self.first = TieredCache(f'first-{self.id()}', options)
+        self.second = TieredCache(f'second-{self.id()}', options)
+
+    def test_value_goes_through_shared_tier(self):
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        stats = self.second.tier_stats()
+        self.assertEqual(stats['local']['hits'], 1)
+        self.assertEqual(stats['shared']['hits'], 1)
+        self.assertEqual(stats['local']['hit_ratio'], 0.5)
+
+    def test_invalidation_reaches_other_process(self):
+        self.first.set('key', 'old')
+        self.second.get('key')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.assertTrue(self.first.add('counter', 1))
+        self.assertEqual(self.first.incr('counter', 5), 6)
+        self.assertEqual(self.second.get('counter'), 6)
+
+    def test_clear_reaches_other_process(self):
+        self.first.set('key', 'value')
+        self.second.get('key')
+        self.first.clear()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_local_copy_is_checked_once_per_interval(self):
+        options = {'OPTIONS': {'SHARED': 'tiered_shared',
+                               'POLL_INTERVAL': 60}}
+        third = TieredCache(f'third-{self.id()}', options)
+        self.first.set('key', 'old')
+        self.assertEqual(third.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(third.get('key'), 'old')
+        third.local.delete(CHECKED_KEY.format('key'))
+        self.assertEqual(third.get('key'), 'new')
+        self.assertEqual(third.tier_stats()['invalidations'], 1)
+
+
+class WsgiToAsgiTest(SimpleTestCase):
+    @staticmethod
+    def wsgi_application(environ, start_response):
+        body = environ['wsgi.input'].read()
+        start_response('201 Created', [('Content-Type', 'text/plain'),
+                                       ('X-Path', environ['PATH_INFO'])])
+        return [environ['REQUEST_METHOD'].encode(), b':', body]
+
+    def call(self, scope, messages):
+        sent = []
+        messages = iter(messages)
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message)
+
+        application = WsgiToAsgi(self.wsgi_application, max_workers=1)
+        asyncio.run(application(scope, receive, send))
+        application.executor.shutdown()
+        return sent
+
+    def test_request_body_and_response(self):
+        sent = self.call(
+            {'type': 'http', 'method': 'POST', 'path': '/пост/',
+             'headers': [(b'content-type', b'text/plain')]},
+            [{'type': 'http.request', 'body': b'te', 'more_body': True},
+             {'type': 'http.request', 'body': b'xt'}],
+        )
+        self.assertEqual(sent[0]['status'], 201)
+        # Путь в WSGI — байты UTF-8, прочитанные как latin-1.
+        self.assertIn((b'x-path', '/пост/'.encode()), sent[0]['headers'])
+        self.assertEqual(b''.join(message.get('body', b'')
+                                  for message in sent[1:]), b'POST:text')
+
+    def test_lifespan(self):
+        sent = self.call({'type': 'lifespan'},
+                         [{'type': 'lifespan.startup'},
+                          {'type': 'lifespan.shutdown'}])
+        self.assertEqual([message['type'] for message in sent],
+                         ['lifespan.startup.complete',
+                          'lifespan.shutdown.complete'])
+
+
+class SessionStoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+
+    def test_authenticated_session_read_from_cache(self):
+        self.client.force_login(self.user)
+        key = self.client.session.session_key
+        self.assertTrue(Session.objects.filter(pk=key).exists())
+        with self.assertNumQueries(0):
+            session = sessions.SessionStore(key)
+            self.assertEqual(session['_auth_user_id'], str(self.user.pk))
+
+    def test_unmodified_session_not_saved(self):
+        self.client.force_login(self.user)
+        session = sessions.SessionStore(self.client.session.session_key)
+        session['_auth_user_id'] = session['_auth_user_id']
+        with self.assertNumQueries(0):
+            session.save()
+        session['theme'] = 'dark'
+        session.save()
+        self.assertEqual(Session.objects.get(
+            pk=session.session_key).get_decoded()['theme'], 'dark')
+
+    def test_anonymous_session_in_signed_cookie(self):
+        session = sessions.SessionStore()
+        session['theme'] = 'dark'
+        with self.assertNumQueries(0):
+            session.save()
+        self.assertTrue(sessions.is_signed(session.session_key))
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(
+            sessions.SessionStore(session.session_key)['theme'], 'dark')
+        self.assertEqual(
+            sessions.SessionStore(session.session_key + 'x').load(), {})
+
+    def test_login_moves_session_to_database(self):
+        session = sessions.SessionStore()
+        session['theme'] = 'dark'
+        session.save()
+        session['_auth_user_id'] = str(self.user.pk)
+        session.save()
+        self.assertFalse(sessions.is_signed(session.session_key))
+        self.assertEqual(
+            Session.objects.get(pk=session.session_key).get_decoded(),
+            {'theme': 'dark', '_auth_user_id': str(self.user.pk)})
+
+    def test_purge_sessions_in_batches(self):
+        expired = timezone.now() - dt.timedelta(days=1)
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{number:03}', session_data='',
+                    expire_date=expired) for number in range(5))
+        self.client.force_login(self.user)
+        call_command('purge_sessions', batch_size=2, pause=0,
+                     stdout=StringIO())
+        self.assertEqual(Session.objects.count(), 1)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('', views.performance_stats, name='performance_stats'),
+    path('cache/', views.cache_stats, name='cache_stats'),
+    path('templates/', views.template_stats, name='template_stats'),
+]
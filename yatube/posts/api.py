@@ -0,0 +1,184 @@
+"""JSON API только для чтения: ленты, пост и комментарии.
+
+Строки выбираются через `.values()` только с нужными колонками,
+модели не создаются. Параметр `fields` сужает набор полей
+(`?fields=id,text`), `cursor` листает ленту. ETag строится из версий
+областей кэша фрагментов, поэтому ответ 304 обходится без базы.
+"""
+import hashlib
+from functools import wraps
+from http import HTTPStatus
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from . import feed, fragments
+from .models import Comment, Group, Post, User
+from .pagination import CursorPaginator
+
+PER_PAGE = 20
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+# В ответах есть `comments_count`, поэтому ETag зависит и от него.
+POST_SCOPES = (fragments.POSTS, fragments.COMMENT_COUNTS)
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def _fields(request, available):
+    """Запрошенные поля ответа; по умолчанию все."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(available)
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = set(fields) - available.keys()
+    if unknown or not fields:
+        raise FieldsError(
+            'Неизвестные поля: ' + ', '.join(sorted(unknown or {requested})))
+    return fields
+
+
+def _serialize(rows, fields, available):
+    result = []
+    for row in rows:
+        item = {name: row[available[name]] for name in fields}
+        if item.get('image'):
+            item['image'] = IMAGE_STORAGE.url(item['image'])
+        result.append(item)
+    return result
+
+
+def _columns(fields, available, ordering):
+    # Ключ курсора нужен всегда, даже если его нет в ответе.
+    return {available[name] for name in fields} | {'pk', ordering}
+
+
+def _page(request, queryset, available, ordering='pub_date'):
+    try:
+        fields = _fields(request, available)
+    except FieldsError as error:
+        return JsonResponse({'detail': str(error)},
+                            status=HTTPStatus.BAD_REQUEST)
+    rows = queryset.values(*_columns(fields, available, ordering))
+    paginator = CursorPaginator(rows, PER_PAGE, field=ordering)
+    page = paginator.get_page(cursor=request.GET.get('cursor'))
+    return JsonResponse({
+        'results': _serialize(page, fields, available),
+        'next_cursor': paginator.next_cursor,
+        'previous_cursor': paginator.previous_cursor,
+    })
+
+
+def _etag(*scopes):
+    """ETag по версиям областей, пользователю и адресу с параметрами."""
+    def etag(request, *args, **kwargs):
+        names = [scope(request, **kwargs) if callable(scope) else scope
+                 for scope in scopes]
+        versions = '.'.join(
+            str(fragments.get_version(name)) for name in names)
+        raw = f'{versions}:{request.user.pk}:{request.get_full_path()}'
+        return hashlib.md5(raw.encode()).hexdigest()
+    return etag
+
+
+def _conditional(*scopes):
+    """Как `condition`, но ETag получают только успешные ответы.
+
+    Ответы 401 и 404 не должны попадать в кэши клиентов под ETag
+    ленты, которую они не содержат.
+    """
+    etag_func = _etag(*scopes)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag = quote_etag(etag_func(request, *args, **kwargs))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != HTTPStatus.OK:
+                    return response
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def _follow_scope(request, **kwargs):
+    return fragments.follow_scope(request.user.pk)
+
+
+def _comments_scope(request, post_id):
+    return fragments.comments_scope(post_id)
+
+
+@require_safe
+@_conditional(*POST_SCOPES)
+def index(request):
+    return _page(request, Post.objects.all(), POST_FIELDS)
+
+
+@require_safe
+@_conditional(*POST_SCOPES)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return _page(request, Post.objects.filter(group=group), POST_FIELDS)
+
+
+@require_safe
+@_conditional(*POST_SCOPES)
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return _page(request, Post.objects.filter(author=author), POST_FIELDS)
+
+
+@require_safe
+@_conditional(*POST_SCOPES, _follow_scope)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Нужна авторизация'},
+                            status=HTTPStatus.UNAUTHORIZED)
+    return _page(request, feed.feed_posts(request.user), POST_FIELDS)
+
+
+@require_safe
+@_conditional(*POST_SCOPES)
+def post_detail(request, post_id):
+    try:
+        fields = _fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return JsonResponse({'detail': str(error)},
+                            status=HTTPStatus.BAD_REQUEST)
+    rows = Post.objects.filter(pk=post_id).values(
+        *{POST_FIELDS[name] for name in fields})
+    if not rows:
+        return JsonResponse({'detail': 'Пост не найден'},
+                            status=HTTPStatus.NOT_FOUND)
+    return JsonResponse(_serialize(rows, fields, POST_FIELDS)[0])
+
+
+@require_safe
+@_conditional(_comments_scope)
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return _page(request, Comment.objects.filter(post_id=post_id),
+                 COMMENT_FIELDS, ordering='created')
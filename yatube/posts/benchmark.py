@@ -0,0 +1,276 @@
+"""Нагрузочный прогон вьюх постов на синтетических данных.
+
+Данные генерируются детерминированно по `seed`, поэтому результаты
+разных коммитов можно сравнивать между собой. `compare_handlers`
+отправляет одни и те же запросы на чтение параллельно через WSGI
+в пуле потоков и через ASGI-обёртку из `core.asgi`.
+"""
+import asyncio
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from statistics import mean
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.asgi import WsgiToAsgi
+from core.metrics import percentile
+
+from . import counters, feed, follow_graph
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 500
+SCENARIOS = ('index', 'group_posts', 'profile', 'post_detail',
+             'follow_index', 'profile_follow', 'add_comment')
+READ_SCENARIOS = SCENARIOS[:5]
+HOST = 'testserver'
+
+
+def seed(users=50, posts=1000, groups=5, follow_density=0.1,
+         comments_mean=3.0, random_seed=0):
+    """Заполняет базу пользователями, группами, постами, подписками
+    и комментариями; возвращает id созданных пользователей."""
+    rng = random.Random(random_seed)
+    password = make_password(None)
+    User.objects.bulk_create(
+        (User(username=f'bench_user_{i}', password=password)
+         for i in range(users)),
+        batch_size=BATCH_SIZE
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith='bench_user_').values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        (Group(title=f'Группа {i}', slug=f'bench-group-{i}',
+               description='Синтетическая группа') for i in range(groups)),
+        batch_size=BATCH_SIZE
+    )
+    group_ids = list(Group.objects.filter(
+        slug__startswith='bench-group-').values_list('pk', flat=True))
+    Post.objects.bulk_create(
+        (Post(author_id=rng.choice(user_ids),
+              group_id=rng.choice(group_ids + [None]),
+              text=f'Синтетический пост {i} ' * rng.randint(1, 20))
+         for i in range(posts)),
+        batch_size=BATCH_SIZE
+    )
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id in user_ids for author_id in user_ids
+         if user_id != author_id and rng.random() < follow_density),
+        batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    # Длинный хвост: у немногих постов много комментариев.
+    Comment.objects.bulk_create(
+        (Comment(post_id=post_id, author_id=rng.choice(user_ids),
+                 text=f'Комментарий {n}')
+         for post_id in post_ids
+         for n in range(_comments_count(rng, comments_mean))),
+        batch_size=BATCH_SIZE
+    )
+    counters.reconcile()
+    follow_graph.clear()
+    if feed.is_enabled():
+        feed.rebuild()
+    return user_ids
+
+
+def _comments_count(rng, comments_mean):
+    # Число выбирается по ходу генерации, как и раньше, чтобы те же
+    # `seed` давали те же данные.
+    if not comments_mean:
+        return 0
+    return int(rng.expovariate(1 / comments_mean))
+
+
+def _pools():
+    users = list(User.objects.filter(username__startswith='bench_user_'))
+    return {
+        'user': users,
+        'author': users,
+        'group': list(Group.objects.all()),
+        'post_id': list(Post.objects.values_list('pk', flat=True)),
+    }
+
+
+def _pick(rng, pools):
+    return {name: rng.choice(values) for name, values in pools.items()}
+
+
+def _url(scenario, targets):
+    """Адрес страницы сценария на чтение."""
+    if scenario == 'group_posts':
+        return reverse('posts:group_list', args=[targets['group'].slug])
+    if scenario == 'profile':
+        return reverse('posts:profile', args=[targets['author'].username])
+    if scenario == 'post_detail':
+        return reverse('posts:post_detail', args=[targets['post_id']])
+    if scenario == 'follow_index':
+        return reverse('posts:follow_index')
+    return reverse('posts:index')
+
+
+def _request(client, scenario, targets):
+    if scenario in READ_SCENARIOS:
+        return client.get(_url(scenario, targets))
+    if scenario == 'profile_follow':
+        return client.post(reverse('posts:profile_follow',
+                                   args=[targets['author'].username]))
+    return client.post(reverse('posts:add_comment',
+                               args=[targets['post_id']]),
+                       {'text': 'Комментарий из бенчмарка'})
+
+
+def run(scenarios=SCENARIOS, requests=100, warmup=10, random_seed=0):
+    """Прогоняет сценарии, возвращает задержки, RPS и число запросов к БД."""
+    rng = random.Random(random_seed)
+    pools = _pools()
+    results = {}
+    for scenario in scenarios:
+        cache.clear()
+        client = Client()
+        client.force_login(_pick(rng, pools)['user'])
+        latencies, queries = [], []
+        for i in range(warmup + requests):
+            targets = _pick(rng, pools)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = _request(client, scenario, targets)
+                elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(
+                    f'{scenario}: ответ {response.status_code}')
+            if i >= warmup:
+                latencies.append(elapsed)
+                queries.append(len(captured))
+        results[scenario] = {
+            'requests': requests,
+            'throughput_rps': round(requests / sum(latencies), 1),
+            'latency_ms': _latency_ms(latencies),
+            'queries': {'mean': round(mean(queries), 2),
+                        'max': max(queries)},
+        }
+    return results
+
+
+def _latency_ms(latencies):
+    latencies = sorted(latencies)
+    return {
+        'mean': round(mean(latencies) * 1000, 2),
+        'p50': round(percentile(latencies, 50) * 1000, 2),
+        'p95': round(percentile(latencies, 95) * 1000, 2),
+        'p99': round(percentile(latencies, 99) * 1000, 2),
+        'max': round(latencies[-1] * 1000, 2),
+    }
+
+
+def _wsgi_get(application, path, cookie):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path,
+        'QUERY_STRING': '', 'SERVER_NAME': HOST, 'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': HOST,
+        'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    status = []
+    started = time.perf_counter()
+    result = application(
+        environ, lambda line, headers, exc_info=None: status.append(line))
+    try:
+        b''.join(result)
+    finally:
+        result.close()
+    return int(status[0].split(' ', 1)[0]), time.perf_counter() - started
+
+
+def _drive_wsgi(application, paths, cookie, concurrency):
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(
+            lambda path: _wsgi_get(application, path, cookie), paths))
+
+
+async def _asgi_get(application, path, cookie):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path,
+        'query_string': b'', 'root_path': '',
+        'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    started = time.perf_counter()
+    await application(scope, receive, send)
+    return messages[0]['status'], time.perf_counter() - started
+
+
+def _drive_asgi(application, paths, cookie, concurrency):
+    async def drive():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(path):
+            async with semaphore:
+                return await _asgi_get(application, path, cookie)
+        return await asyncio.gather(*map(limited, paths))
+    return asyncio.run(drive())
+
+
+def compare_handlers(scenarios=READ_SCENARIOS, requests=100, concurrency=8,
+                     random_seed=0):
+    """Одни и те же GET-запросы параллельно через WSGI и через ASGI."""
+    rng = random.Random(random_seed)
+    pools = _pools()
+    client = Client()
+    client.force_login(_pick(rng, pools)['user'])
+    cookie = (f'{settings.SESSION_COOKIE_NAME}='
+              f'{client.cookies[settings.SESSION_COOKIE_NAME].value}')
+    wsgi = get_wsgi_application()
+    asgi = WsgiToAsgi(wsgi, max_workers=concurrency)
+    drivers = {'wsgi': (_drive_wsgi, wsgi), 'asgi': (_drive_asgi, asgi)}
+    try:
+        return _compare(drivers, scenarios, requests, concurrency,
+                        rng, pools, cookie)
+    finally:
+        asgi.executor.shutdown()
+
+
+def _compare(drivers, scenarios, requests, concurrency, rng, pools, cookie):
+    results = {}
+    for scenario in scenarios:
+        paths = [_url(scenario, _pick(rng, pools)) for _ in range(requests)]
+        results[scenario] = {}
+        for handler, (drive, application) in drivers.items():
+            cache.clear()
+            started = time.perf_counter()
+            responses = drive(application, paths, cookie, concurrency)
+            elapsed = time.perf_counter() - started
+            failed = [status for status, _ in responses if status >= 400]
+            if failed:
+                raise RuntimeError(
+                    f'{scenario} через {handler}: ответ {failed[0]}')
+            results[scenario][handler] = {
+                'requests': requests,
+                'concurrency': concurrency,
+                'throughput_rps': round(requests / elapsed, 1),
+                'latency_ms': _latency_ms(
+                    [latency for _, latency in responses]),
+            }
+    return results
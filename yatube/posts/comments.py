@@ -0,0 +1,58 @@
+"""Постраничная выдача комментариев к посту.
+
+Комментарии листаются курсором по ключу (created, id), автор
+подтягивается тем же запросом. Страницы кэшируются по версии области
+комментариев поста, которую сигналы увеличивают при каждом изменении.
+"""
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from . import fragments
+from .models import Comment
+from .pagination import CursorPaginator
+
+PER_PAGE = 20
+CACHE_TIMEOUT = 60 * 60 * 3
+JSON_CACHE_KEY = 'posts:comments:json:{}:{}'
+
+
+def get_page(post_id, cursor=None):
+    comments = (
+        Comment.objects.filter(post_id=post_id)
+        .select_related('author')
+        .only('text', 'created', 'post_id', 'author__username')
+    )
+    paginator = CursorPaginator(comments, PER_PAGE, field='created')
+    return paginator.get_page(cursor=cursor)
+
+
+def lazy_page(post_id, cursor=None):
+    """Страница, которая читается из базы только при промахе кэша
+    фрагмента в шаблоне."""
+    return SimpleLazyObject(lambda: get_page(post_id, cursor))
+
+
+def cache_key(request, post_id):
+    return fragments.fragment_key(request, fragments.comments_scope(post_id))
+
+
+def as_json(request, post_id):
+    """Страница комментариев в виде словаря для JsonResponse."""
+    key = JSON_CACHE_KEY.format(post_id, cache_key(request, post_id))
+    data = cache.get(key)
+    if data is None:
+        page = get_page(post_id, request.GET.get('cursor'))
+        data = {
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in page
+            ],
+            'next_cursor': page.paginator.next_cursor,
+        }
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
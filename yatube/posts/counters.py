@@ -0,0 +1,83 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F-выражения во вьюхах, которые
+создают записи. Расхождения (например, после правок в админке)
+исправляет команда `reconcile_counters`.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import fragments
+from .models import Comment, Follow, Post, User, UserStats
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+POST_COUNTERS = {
+    'comments_count': (Comment, 'post'),
+}
+BATCH_SIZE = 500
+
+
+def _actual_count(model, field, outer):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by().values(field)
+        .annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def get_stats(user):
+    """Счётчики пользователя; при отсутствии считаются по таблицам."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        defaults = {
+            name: model.objects.filter(**{field: user}).count()
+            for name, (model, field) in USER_COUNTERS.items()
+        }
+        stats, _ = UserStats.objects.get_or_create(
+            user=user, defaults=defaults
+        )
+        return stats
+
+
+def change_user(user, **deltas):
+    updates = {
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    }
+    if not UserStats.objects.filter(user=user).update(**updates):
+        # Новая строка посчитается по таблицам вместе с этим изменением.
+        get_stats(user)
+
+
+def change_post(post, **deltas):
+    Post.objects.filter(pk=post.pk).update(**{
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    })
+    if 'comments_count' in deltas:
+        fragments.bump(fragments.COMMENT_COUNTS)
+
+
+def reconcile():
+    """Исправляет все счётчики, возвращает число исправленных строк."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in missing.iterator()),
+        batch_size=BATCH_SIZE
+    )
+    fixed = {}
+    for counters, queryset, outer in (
+        (USER_COUNTERS, UserStats.objects.all(), 'user'),
+        (POST_COUNTERS, Post.objects.all(), 'pk'),
+    ):
+        for name, (model, field) in counters.items():
+            actual = _actual_count(model, field, outer)
+            fixed[name] = queryset.exclude(**{name: actual}).update(
+                **{name: actual})
+    if fixed['comments_count']:
+        fragments.bump(fragments.COMMENT_COUNTS)
+    return fixed
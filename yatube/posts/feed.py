@@ -0,0 +1,182 @@
+"""Лента подписок с раздачей постов при записи (fan-out on write).
+
+Посты обычных авторов заранее раскладываются по лентам подписчиков
+в таблицу `FeedEntry`. Посты популярных авторов (таблица
+`FeedCelebrity`) не раздаются, а читаются в момент запроса. Множество
+популярных авторов пересчитывает `rebuild_feeds --celebrities`:
+популярным становится автор, у которого подписчиков не меньше
+`FEED_CELEBRITY_FOLLOWERS`, а перестаёт им быть — когда их меньше
+доли `DEMOTE_RATIO` от порога, чтобы автор у самого порога не раздавал
+все свои посты при каждом колебании. Посты выбывших авторов там же
+раздаются подписчикам. Включается настройкой `FEED_FANOUT`.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import follow_graph
+from .models import FeedCelebrity, FeedEntry, Follow, Post
+
+CELEBRITIES_CACHE_KEY = 'posts:feed:celebrities'
+CELEBRITIES_CACHE_TIMEOUT = 300
+DEMOTE_RATIO = 0.8
+BATCH_SIZE = 500
+
+
+def is_enabled():
+    return settings.FEED_FANOUT
+
+
+def celebrity_ids():
+    """Множество id авторов, чьи посты читаются при запросе."""
+    ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if ids is None:
+        ids = set(FeedCelebrity.objects.values_list('author_id', flat=True))
+        cache.set(CELEBRITIES_CACHE_KEY, ids, CELEBRITIES_CACHE_TIMEOUT)
+    return ids
+
+
+def _authors_with_followers(minimum):
+    # Без order_by() сортировка модели попала бы в GROUP BY.
+    return set(
+        Follow.objects.order_by().values('author')
+        .annotate(followers=Count('pk'))
+        .filter(followers__gte=minimum)
+        .values_list('author', flat=True)
+    )
+
+
+def refresh_celebrities():
+    """Пересчитывает популярных авторов и раздаёт посты выбывших.
+
+    Возвращает число добавленных и выбывших авторов.
+    """
+    threshold = settings.FEED_CELEBRITY_FOLLOWERS
+    current = set(FeedCelebrity.objects.values_list('author_id', flat=True))
+    promoted = _authors_with_followers(threshold) - current
+    demoted = current - _authors_with_followers(threshold * DEMOTE_RATIO)
+    FeedCelebrity.objects.bulk_create(
+        (FeedCelebrity(author_id=pk) for pk in promoted),
+        batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    for author_id in demoted:
+        _demote(author_id)
+    cache.delete(CELEBRITIES_CACHE_KEY)
+    return len(promoted), len(demoted)
+
+
+def _demote(author_id):
+    # Пока автор популярен, лишние записи в лентах ничему не мешают,
+    # поэтому посты раздаются до удаления его из таблицы. Посты,
+    # которые он опубликовал за время раздачи, раздаются ещё раз.
+    started = timezone.now()
+    _fan_out_author(author_id)
+    FeedCelebrity.objects.filter(author_id=author_id).delete()
+    cache.delete(CELEBRITIES_CACHE_KEY)
+    _fan_out_author(author_id, since=started)
+
+
+def _fan_out_author(author_id, since=None):
+    """Раздаёт посты автора всем его подписчикам."""
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    posts = list(posts.values_list('pk', 'pub_date'))
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for user_id in followers.iterator() for pk, pub_date in posts
+    )
+
+
+def is_celebrity(author):
+    return author.pk in celebrity_ids()
+
+
+def _bulk_insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if not is_enabled() or is_celebrity(post.author):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user, author):
+    """Добавляет в ленту пользователя посты нового автора."""
+    if not is_enabled() or is_celebrity(author):
+        return
+    posts = Post.objects.filter(author=author).values_list('pk', 'pub_date')
+    _bulk_insert(
+        FeedEntry(user=user, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def prune(user, author):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    if not is_enabled():
+        return
+    FeedEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def feed_posts(user):
+    """Посты ленты подписок пользователя."""
+    following = follow_graph.following_ids(user.pk)
+    if not is_enabled():
+        return Post.objects.filter(author_id__in=following)
+    celebrities = celebrity_ids().intersection(following)
+    return Post.objects.filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=celebrities)
+    )
+
+
+@transaction.atomic
+def rebuild(users=None):
+    """Пересобирает ленты с нуля, возвращает число записей."""
+    if users is None:
+        # Все ленты собираются целиком, раздавать посты выбывших
+        # авторов отдельно не нужно.
+        celebrities = _authors_with_followers(
+            settings.FEED_CELEBRITY_FOLLOWERS)
+        FeedCelebrity.objects.all().delete()
+        FeedCelebrity.objects.bulk_create(
+            (FeedCelebrity(author_id=pk) for pk in celebrities),
+            batch_size=BATCH_SIZE
+        )
+        transaction.on_commit(lambda: cache.delete(CELEBRITIES_CACHE_KEY))
+    else:
+        celebrities = celebrity_ids()
+    entries = FeedEntry.objects.all()
+    follows = Follow.objects.exclude(author__in=celebrities)
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        follows = follows.filter(user__in=users)
+    entries.delete()
+    count = 0
+    for user_id, author_id in follows.values_list(
+            'user_id', 'author_id').iterator():
+        posts = Post.objects.filter(
+            author_id=author_id
+        ).values_list('pk', 'pub_date')
+        batch = [
+            FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        ]
+        _bulk_insert(batch)
+        count += len(batch)
+    return count
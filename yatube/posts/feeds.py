@@ -0,0 +1,118 @@
+"""Ленты RSS и Atom: все посты, посты группы и посты автора.
+
+Ответы кэшируются целиком по версии постов, а `Last-Modified`
+берётся из самого нового `pub_date`, так что частый опрос лент
+обходится 304 или готовым ответом из кэша.
+"""
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+
+from . import page_cache
+from .models import Group, Post, User
+
+ITEMS = 20
+TITLE_LENGTH = 50
+
+
+class PostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    link = reverse_lazy('posts:index')
+    description = 'Новые записи всех авторов'
+
+    def items(self):
+        return Post.objects.for_listing()[:ITEMS]
+
+    def item_title(self, item):
+        return truncatechars(item.text, TITLE_LENGTH)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+
+class GroupPostsFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    def description(self, obj):
+        return obj.description
+
+    def items(self, obj):
+        return obj.posts.for_listing()[:ITEMS]
+
+
+class AuthorPostsFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: записи {obj.get_full_name() or obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def description(self, obj):
+        return f'Новые записи пользователя {obj.username}'
+
+    def items(self, obj):
+        return obj.posts.for_listing()[:ITEMS]
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+
+class PostsAtomFeed(AtomMixin, PostsFeed):
+    pass
+
+
+class GroupPostsAtomFeed(AtomMixin, GroupPostsFeed):
+    pass
+
+
+class AuthorPostsAtomFeed(AtomMixin, AuthorPostsFeed):
+    pass
+
+
+def _cached(feed, last_modified):
+    return page_cache.cached_page(last_modified)(feed)
+
+
+def _newest_post(**kwargs):
+    return page_cache.newest(Post.objects.all())
+
+
+def _newest_group_post(slug):
+    return page_cache.newest(Post.objects.filter(group__slug=slug))
+
+
+def _newest_author_post(username):
+    return page_cache.newest(Post.objects.filter(author__username=username))
+
+
+posts_rss = _cached(PostsFeed(), _newest_post)
+posts_atom = _cached(PostsAtomFeed(), _newest_post)
+group_rss = _cached(GroupPostsFeed(), _newest_group_post)
+group_atom = _cached(GroupPostsAtomFeed(), _newest_group_post)
+author_rss = _cached(AuthorPostsFeed(), _newest_author_post)
+author_atom = _cached(AuthorPostsAtomFeed(), _newest_author_post)
@@ -0,0 +1,115 @@
+"""Подписки пользователей в кэше.
+
+Для каждого пользователя в кэше лежит отсортированный массив id
+авторов, на которых он подписан (`array` занимает меньше списка
+и множества и быстрее распаковывается). Проверка подписки — двоичный
+поиск по массиву, лента подписок — фильтр `author_id__in`, так что
+вьюхи ленты и профиля не обращаются к таблице `Follow`.
+
+В ключ массива входит номер версии подписок пользователя. После
+коммита подписки или отписки версия увеличивается, а массив прежней
+версии с этим изменением кладётся под новый ключ, если его там ещё
+нет. Старый массив под новым ключом не окажется: если версию
+за это время увеличили ещё раз, прежнего массива уже не найти,
+и новый соберётся из базы. Массив собирается из основной базы,
+а не из реплики, которая может отставать. Массовые вставки в обход
+сигналов (импорт, бенчмарк) сбрасывают весь граф через `clear`:
+номер поколения тоже входит в ключи.
+
+Число подписчиков здесь не хранится: его держит `UserStats`
+(см. `counters`).
+"""
+import time
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Follow
+
+GENERATION_KEY = 'posts:follow:generation'
+VERSION_KEY = 'posts:follow:{}:version'
+FOLLOWING_KEY = 'posts:follow:{}:following:{}:{}'
+# Массивы под устаревшими ключами сами истекают через это время.
+FOLLOWING_TIMEOUT = 60 * 60
+TYPECODE = 'q'
+
+
+def _initial_version():
+    # Версия не должна повторять вытесненную из кэша.
+    return int(time.time() * 1000)
+
+
+def _version(user_id):
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def _following_key(user_id, version=None):
+    generation = cache.get_or_set(GENERATION_KEY, 0, None)
+    if version is None:
+        version = _version(user_id)
+    return FOLLOWING_KEY.format(generation, user_id, version)
+
+
+def following_ids(user_id):
+    """Отсортированный массив id авторов, на которых подписан пользователь."""
+    # Ключ берём до чтения базы: если подписки изменятся раньше,
+    # чем массив попадёт в кэш, он окажется под устаревшим ключом.
+    key = _following_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = array(TYPECODE, Follow.objects.using(DEFAULT_DB_ALIAS).filter(
+            user_id=user_id).order_by('author_id').values_list(
+            'author_id', flat=True))
+        cache.set(key, ids, FOLLOWING_TIMEOUT)
+    return ids
+
+
+def _position(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index, index < len(ids) and ids[index] == author_id
+
+
+def is_following(user_id, author_id):
+    return _position(following_ids(user_id), author_id)[1]
+
+
+def _change(user_id, author_id, follow):
+    try:
+        version = cache.incr(VERSION_KEY.format(user_id))
+    except ValueError:
+        # Версии нет — нет и массивов, которые надо поправить.
+        return
+    ids = cache.get(_following_key(user_id, version - 1))
+    if ids is None:
+        return
+    index, found = _position(ids, author_id)
+    if follow and not found:
+        ids.insert(index, author_id)
+    elif found and not follow:
+        del ids[index]
+    # Массив мог уже собраться из базы, он не хуже нашего.
+    cache.add(_following_key(user_id, version), ids, FOLLOWING_TIMEOUT)
+
+
+def added(user_id, author_id):
+    transaction.on_commit(lambda: _change(user_id, author_id, True))
+
+
+def removed(user_id, author_id):
+    transaction.on_commit(lambda: _change(user_id, author_id, False))
+
+
+def clear():
+    """Сбрасывает закэшированные подписки всех пользователей."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, None)
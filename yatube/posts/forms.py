@@ -1,3 +1,4 @@
+from .images import process_upload
 from .models import Post, Comment
 from django import forms
 
@@ -23,6 +24,9 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Введите текст')
         return data
 
+    def clean_image(self):
+        return process_upload(self.cleaned_data['image'])
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
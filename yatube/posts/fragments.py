@@ -0,0 +1,56 @@
+"""Версии содержимого для кэша фрагментов шаблонов.
+
+Ключ фрагмента складывается из версий областей (все посты, подписки
+пользователя, комментарии поста) и номера страницы или курсора.
+Сигналы моделей увеличивают версию, и старые фрагменты больше
+не читаются, поэтому время жизни кэша можно делать большим.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'posts:version:{}'
+
+POSTS = 'posts'
+# Счётчики комментариев постов: их показывает только API, поэтому
+# комментарий не сбрасывает кэш HTML-лент вместе с `POSTS`.
+COMMENT_COUNTS = 'comment_counts'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def comments_scope(post_id):
+    return f'comments:{post_id}'
+
+
+def _initial_version():
+    # Версия не должна повторять вытесненную из кэша.
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def fragment_key(request, *scopes):
+    """Ключ фрагмента страницы для переданных областей."""
+    versions = '.'.join(str(get_version(scope)) for scope in scopes)
+    page = request.GET.get('cursor') or request.GET.get('page') or '1'
+    return f'{versions}:{page}'
@@ -0,0 +1,190 @@
+"""Обработка загруженных изображений постов.
+
+Загрузка пишется во временный файл (см. FILE_UPLOAD_HANDLERS),
+размеры проверяются по заголовку без декодирования. Затем картинка
+уменьшается до `IMAGE_MAX_WIDTH`, поворачивается по EXIF и
+перекодируется без метаданных. Оригинал остаётся, только если он
+и так меньше, не содержит метаданных и не требует уменьшения.
+Для страницы поста сохраняются копии шириной `IMAGE_WIDTHS`,
+из которых шаблон собирает `srcset`. Одинаковые изображения хранятся
+одним файлом (см. `storage`), поэтому `release` удаляет файл с копиями
+и миниатюрами, только когда на него не ссылается ни один пост.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageVariant, Post, ThumbnailJob
+
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'icc_profile')
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+EXIF_ORIENTATION = 0x0112
+# При этих значениях ориентации поворот меняет ширину и высоту местами.
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+logger = logging.getLogger(__name__)
+
+
+def _output_format(image):
+    if features.check('webp'):
+        return 'WEBP'
+    return 'PNG' if _has_alpha(image) else 'JPEG'
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=settings.IMAGE_QUALITY,
+               optimize=True)
+    return buffer.getvalue()
+
+
+def _open(upload):
+    """Изображение с проверенными размерами; пиксели ещё не прочитаны."""
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ',
+            params={'limit': settings.IMAGE_MAX_UPLOAD_SIZE // 2 ** 20})
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать изображение')
+    width, height = image.size
+    if max(width, height) > settings.IMAGE_MAX_DIMENSION:
+        raise ValidationError(
+            'Изображение больше %(limit)d пикселей по стороне',
+            params={'limit': settings.IMAGE_MAX_DIMENSION})
+    return image
+
+
+def _draft(image, max_width):
+    """Включает декодирование JPEG сразу в уменьшенном масштабе.
+
+    Размер считается для картинки уже после поворота по EXIF, а `draft`
+    принимает его в исходной ориентации.
+    """
+    width, height = image.size
+    transposed = (image.getexif().get(EXIF_ORIENTATION)
+                  in TRANSPOSED_ORIENTATIONS)
+    if transposed:
+        width, height = height, width
+    box = (max_width, max_width * height // width)
+    image.draft('RGB', box[::-1] if transposed else box)
+
+
+def process_upload(upload):
+    """Файл для сохранения в `Post.image` вместо загруженного."""
+    if not isinstance(upload, UploadedFile):
+        return upload
+    image = _open(upload)
+    if getattr(image, 'is_animated', False):
+        # Анимацию перекодирование бы потеряло.
+        return upload
+    max_width = settings.IMAGE_MAX_WIDTH
+    _draft(image, max_width)
+    has_metadata = any(key in image.info for key in METADATA_KEYS)
+    image = ImageOps.exif_transpose(image)
+    resized = image.width > max_width
+    if resized:
+        image.thumbnail((max_width, image.height), Image.LANCZOS)
+    image_format = _output_format(image)
+    content = _encode(image, image_format)
+    if not (resized or has_metadata) and len(content) >= upload.size:
+        upload.seek(0)
+        return upload
+    root = os.path.splitext(os.path.basename(upload.name))[0]
+    return ContentFile(content, name=f'{root}.{EXTENSIONS[image_format]}')
+
+
+def save_variants(post):
+    """Сохраняет уменьшенные копии изображения поста для `srcset`."""
+    if not post.image:
+        srcset = ''
+    else:
+        storage = post.image.storage
+        with post.image.open('rb'), Image.open(post.image) as image:
+            image.load()
+            image_format = _output_format(image)
+            root = os.path.splitext(post.image.name)[0]
+            variants = []
+            for width in settings.IMAGE_WIDTHS:
+                if width >= image.width:
+                    break
+                copy = image.copy()
+                copy.thumbnail((width, image.height), Image.LANCZOS)
+                name = storage.save(
+                    f'{root}-{width}w.{EXTENSIONS[image_format]}',
+                    ContentFile(_encode(copy, image_format)))
+                variants.append(f'{name} {width}w')
+        if variants:
+            variants.append(f'{post.image.name} {image.width}w')
+        srcset = ', '.join(variants)
+    post.image_srcset = srcset
+    names = [name for name in _srcset_names(srcset)
+             if name != post.image.name]
+    with transaction.atomic():
+        Post.objects.filter(pk=post.pk).update(image_srcset=srcset)
+        ImageVariant.objects.filter(post=post).delete()
+        ImageVariant.objects.bulk_create(
+            ImageVariant(post=post, name=name) for name in names)
+    if names:
+        storage = post.image.storage
+        transaction.on_commit(lambda: storage.end_lease(*names))
+
+
+def _srcset_names(value):
+    return [candidate.rsplit(' ', 1)[0]
+            for candidate in value.split(', ') if candidate]
+
+
+def _referenced(name):
+    # Копия одного поста может совпасть по содержимому с изображением
+    # или копией другого, и тогда это один и тот же файл.
+    return (Post.objects.filter(image=name).exists()
+            or ImageVariant.objects.filter(name=name).exists())
+
+
+def release(name, srcset=''):
+    """Удаляет файл изображения, если ни один пост на него не ссылается."""
+    if not name or _referenced(name):
+        return
+    storage = Post._meta.get_field('image').storage
+    try:
+        for variant in _srcset_names(srcset):
+            if variant != name:
+                storage.delete_unused(variant, _referenced)
+        if storage.delete_unused(name, _referenced):
+            ThumbnailJob.objects.filter(image=name).delete()
+            delete_thumbnails(ImageFile(name, storage), delete_file=False)
+    except SuspiciousFileOperation:
+        logger.warning('Изображение %s вне каталога медиафайлов', name)
+
+
+def srcset(post):
+    """Значение атрибута `srcset` с URL копий изображения."""
+    if not post.image_srcset:
+        return ''
+    storage = post.image.storage
+    candidates = []
+    for candidate in post.image_srcset.split(', '):
+        name, width = candidate.rsplit(' ', 1)
+        candidates.append(f'{storage.url(name)} {width}')
+    return ', '.join(candidates)
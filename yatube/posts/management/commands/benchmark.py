@@ -0,0 +1,102 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет нагрузочный тест вьюх постов на синтетических '
+            'данных во временной базе и печатает результат в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--follow-density', type=float, default=0.1,
+                            help='Вероятность подписки между двумя авторами')
+        parser.add_argument('--comments', type=float, default=3.0,
+                            help='Среднее число комментариев к посту')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Замеряемых запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Незамеряемых запросов перед замером')
+        parser.add_argument('--scenario', action='append',
+                            choices=benchmark.SCENARIOS,
+                            help='Сценарии прогона (по умолчанию все)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--compare-handlers', action='store_true',
+                            help='Сравнить WSGI и ASGI на сценариях чтения')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Одновременных запросов при сравнении')
+        parser.add_argument('--output', help='Файл для отчёта')
+
+    def handle(self, *args, **options):
+        config = {
+            key: options[key] for key in (
+                'users', 'posts', 'groups', 'follow_density', 'comments',
+                'requests', 'warmup', 'seed', 'compare_handlers',
+                'concurrency'
+            )
+        }
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            benchmark.seed(
+                users=options['users'], posts=options['posts'],
+                groups=options['groups'],
+                follow_density=options['follow_density'],
+                comments_mean=options['comments'],
+                random_seed=options['seed'],
+            )
+            if options['compare_handlers']:
+                results = benchmark.compare_handlers(
+                    scenarios=[
+                        scenario for scenario in
+                        options['scenario'] or benchmark.READ_SCENARIOS
+                        if scenario in benchmark.READ_SCENARIOS
+                    ],
+                    requests=options['requests'],
+                    concurrency=options['concurrency'],
+                    random_seed=options['seed'],
+                )
+            else:
+                results = benchmark.run(
+                    scenarios=options['scenario'] or benchmark.SCENARIOS,
+                    requests=options['requests'], warmup=options['warmup'],
+                    random_seed=options['seed'],
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        report = json.dumps({
+            'meta': {
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'config': config,
+            },
+            'results': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+        self.stdout.write(report)
@@ -0,0 +1,43 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для стандартного вывода')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='По умолчанию по расширению файла')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        write = transfer.write_csv if file_format == 'csv' else (
+            transfer.write_jsonl)
+        started = time.perf_counter()
+        rows = 0
+
+        def counted(records):
+            nonlocal rows
+            for record in records:
+                rows += 1
+                yield record
+
+        output = sys.stdout if path == '-' else open(
+            path, 'w', encoding='utf-8', newline='')
+        try:
+            write(counted(transfer.export_records()), output)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Строк: {rows} за {elapsed:.1f} с '
+            f'({rows / elapsed if elapsed else rows:.0f} строк/с)'
+        )
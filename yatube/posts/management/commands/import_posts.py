@@ -0,0 +1,47 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из JSONL '
+            'или CSV, созданного export_posts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для стандартного ввода')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='По умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int,
+                            default=transfer.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        read = transfer.read_csv if file_format == 'csv' else (
+            transfer.read_jsonl)
+        importer = transfer.Importer(options['batch_size'])
+        started = time.perf_counter()
+        source = sys.stdin if path == '-' else open(
+            path, encoding='utf-8', newline='')
+        rows = 0
+        try:
+            for record in read(source):
+                importer.add(record)
+                rows += 1
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        stats = importer.finish()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(', '.join(
+            f'{name}: {count}' for name, count in sorted(stats.items())))
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {rows}, пропущено: {stats["skipped"]} за {elapsed:.1f} с '
+            f'({rows / elapsed if elapsed else rows:.0f} строк/с)'
+        ))
+        self.stdout.write(
+            'Поисковый индекс не обновлялся: запустите rebuild_search_index')
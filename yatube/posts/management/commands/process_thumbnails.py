@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры изображений из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Сколько заданий обработать за проход'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а опрашивать очередь'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между проходами в секундах для --loop'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done = thumbnails.process(options['limit'])
+            self.stdout.write(f'Миниатюр создано: {done}')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты нужно пересобрать (по умолчанию все)'
+        )
+        parser.add_argument(
+            '--celebrities', action='store_true',
+            help='Только пересчитать популярных авторов и раздать посты '
+                 'выбывших, не пересобирая ленты'
+        )
+
+    def handle(self, *args, **options):
+        if options['celebrities']:
+            promoted, demoted = feed.refresh_celebrities()
+            self.stdout.write(self.style.SUCCESS(
+                f'Популярных авторов добавлено: {promoted}, '
+                f'выбыло: {demoted}'
+            ))
+            return
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        count = feed.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент пересобрано, записей: {count}'
+        ))
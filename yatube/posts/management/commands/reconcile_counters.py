@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок'
+
+    def handle(self, *args, **options):
+        for name, fixed in counters.reconcile().items():
+            self.stdout.write(f'{name}: исправлено строк {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
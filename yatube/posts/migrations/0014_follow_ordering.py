@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='follow',
+            options={'ordering': ['-id']},
+        ),
+    ]
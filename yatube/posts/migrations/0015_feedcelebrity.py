@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 08:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_celebrities(apps, schema_editor):
+    # Раньше популярные авторы считались при запросе, и их посты
+    # в ленты не раздавались: таблица должна начаться с них же.
+    Follow = apps.get_model('posts', 'Follow')
+    FeedCelebrity = apps.get_model('posts', 'FeedCelebrity')
+    authors = Follow.objects.order_by().values('author').annotate(
+        followers=models.Count('pk')).filter(
+        followers__gte=settings.FEED_CELEBRITY_FOLLOWERS).values_list(
+        'author', flat=True)
+    FeedCelebrity.objects.bulk_create(
+        FeedCelebrity(author_id=pk) for pk in authors.iterator())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0014_follow_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCelebrity',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_celebrity', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(add_celebrities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 08:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_variants(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageVariant = apps.get_model('posts', 'ImageVariant')
+    posts = Post.objects.exclude(image_srcset='').values_list(
+        'pk', 'image', 'image_srcset')
+    ImageVariant.objects.bulk_create((
+        ImageVariant(post_id=pk, name=candidate.rsplit(' ', 1)[0])
+        for pk, image, srcset in posts.iterator()
+        for candidate in srcset.split(', ')
+        if candidate.rsplit(' ', 1)[0] != image
+    ), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_feedcelebrity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_variants', to='posts.Post')),
+            ],
+        ),
+        migrations.RunPython(add_variants, migrations.RunPython.noop),
+    ]
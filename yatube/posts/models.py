@@ -1,9 +1,21 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Посты для карточек в лентах: автор и группа одним запросом."""
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'image', 'author', 'group',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -16,14 +28,30 @@ class Post(models.Model):
                               on_delete=models.SET_NULL,
                               blank=True, null=True,
                               related_name='posts')
+    # Файлы общие у постов с одинаковым изображением, индекс нужен,
+    # чтобы быстро проверить, остались ли на файл ссылки.
     image = models.ImageField(upload_to='posts/',
-                              blank=True)
+                              storage=ContentAddressedStorage(),
+                              blank=True, db_index=True)
+    # Копии изображения разной ширины: «имя 480w, имя 960w, ...».
+    image_srcset = models.TextField(blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+        ]
 
 
 class Group(models.Model):
@@ -54,6 +82,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -70,3 +102,96 @@ class Follow(models.Model):
 
     class Meta:
         ordering = ['-id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+            models.CheckConstraint(check=~models.Q(user=models.F('author')),
+                                   name='prevent_self_follow'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя вместо COUNT(*) на каждой странице."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class ThumbnailJob(models.Model):
+    """Изображение, для которого нужно заранее сделать миниатюру."""
+    image = models.CharField(max_length=255, unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['id']
+
+
+class SearchTerm(models.Model):
+    """Запись инвертированного индекса: основа слова в посте."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        blank=True, null=True,
+        related_name='search_terms'
+    )
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        index_together = ('term', 'post')
+
+
+class FeedEntry(models.Model):
+    """Пост в заранее собранной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        unique_together = ('user', 'post')
+        index_together = ('user', 'pub_date')
+
+
+class FeedCelebrity(models.Model):
+    """Популярный автор: его посты не раздаются, а читаются при запросе."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_celebrity'
+    )
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия изображения поста для `srcset`.
+
+    Копии хранятся и в `Post.image_srcset` для шаблонов, а здесь —
+    с индексом по имени, чтобы быстро найти ссылки на общий файл.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants'
+    )
+    name = models.CharField(max_length=255, db_index=True)
@@ -0,0 +1,100 @@
+"""Кэш целых страниц для анонимных посетителей и лент RSS/Atom.
+
+Страница хранится под ключом из версий областей содержимого
+(см. `fragments`) и полного адреса со схемой, хостом и параметрами:
+ленты содержат абсолютные ссылки, и ответ для одного `Host` нельзя
+отдавать по другому. Изменение постов или комментариев сразу даёт
+новый ключ. Тот же ключ служит ETag: на повторный запрос с совпавшим
+`If-None-Match` отвечаем 304, не трогая базу и шаблоны.
+`Last-Modified` — время самой новой записи на странице, его считаем
+при первом рендере.
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import fragments
+
+PAGE_KEY = 'posts:page:{}'
+PAGE_TIMEOUT = 60 * 60 * 3
+READ_METHODS = ('GET', 'HEAD')
+
+
+def newest(queryset, field='pub_date'):
+    """Время самой новой записи или None, если записей нет."""
+    return queryset.aggregate(newest=Max(field))['newest']
+
+
+def _page_key(request, scopes):
+    versions = '.'.join(str(fragments.get_version(scope)) for scope in scopes)
+    raw = f'{versions}:{request.build_absolute_uri()}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _set_headers(response, etag, last_modified, vary_cookie):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    if vary_cookie:
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _timestamp(value):
+    # В заголовках время с точностью до секунды.
+    return int(value.timestamp()) if value is not None else None
+
+
+def cached_page(last_modified, scopes=lambda **kwargs: (),
+                anonymous_only=False):
+    """Кэширует страницу и отвечает на условные запросы.
+
+    `last_modified(**kwargs)` возвращает время самой новой записи
+    страницы, `scopes(**kwargs)` — области кэша фрагментов, кроме общей
+    области постов, от которых зависит страница. С `anonymous_only`
+    авторизованные пользователи получают страницу без кэша.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in READ_METHODS or (
+                    anonymous_only and request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            key = _page_key(request,
+                            (fragments.POSTS, *scopes(**kwargs)))
+            etag = f'"{key}"'
+            entry = cache.get(PAGE_KEY.format(key))
+            # Отвечаем 304 и ставим валидаторы, только когда известно,
+            # что страница отдаётся с кодом 200: в кэше лежат только такие.
+            if entry is not None:
+                modified = entry['last_modified']
+                not_modified = get_conditional_response(
+                    request, etag=etag, last_modified=_timestamp(modified))
+                if not_modified is not None:
+                    return _set_headers(not_modified, etag, modified,
+                                        anonymous_only)
+                response = HttpResponse(entry['content'],
+                                        content_type=entry['content_type'])
+                return _set_headers(response, etag, modified, anonymous_only)
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.cookies:
+                return response
+            modified = last_modified(**kwargs)
+            cache.set(PAGE_KEY.format(key), {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'last_modified': modified,
+            }, PAGE_TIMEOUT)
+            return _set_headers(response, etag, modified, anonymous_only)
+        return wrapper
+    return decorator
+
+
+def anonymous_page(last_modified, scopes=lambda **kwargs: ()):
+    """`cached_page` только для анонимных посетителей."""
+    return cached_page(last_modified, scopes, anonymous_only=True)
@@ -0,0 +1,144 @@
+from django.core.paginator import (EmptyPage, InvalidPage, PageNotAnInteger,
+                                   Paginator)
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+FORWARD = 'n'
+BACKWARD = 'p'
+ELLIPSIS = '…'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (field, pk) без OFFSET и COUNT(*).
+
+    Курсор — непрозрачная строка с номером страницы, направлением
+    и ключом крайней записи соседней страницы. Номер страницы нужен
+    только для совместимости со стандартным `Page`. Общее число записей
+    не считается: о следующей странице говорит лишняя запись выборки,
+    поэтому число страниц известно лишь до следующей за текущей.
+    """
+
+    ELLIPSIS = ELLIPSIS
+
+    def __init__(self, object_list, per_page, field='pub_date', **kwargs):
+        self.field = field
+        object_list = object_list.order_by(f'-{field}', '-pk')
+        super().__init__(object_list, per_page, **kwargs)
+        self.number = 1
+        self.has_next = False
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @property
+    def num_pages(self):
+        return self.number + 1 if self.has_next else self.number
+
+    @property
+    def elided_page_range(self):
+        """Номера для ссылок: первая страница и соседние с текущей.
+
+        Соседние открываются по курсорам, а дальние пришлось бы читать
+        через OFFSET, поэтому вместо них `ELLIPSIS`.
+        """
+        number = self.number
+        pages = [1] if number > 1 else []
+        if number > 3:
+            pages.append(ELLIPSIS)
+        if number > 2:
+            pages.append(number - 1)
+        pages.append(number)
+        if self.has_next:
+            pages.append(number + 1)
+        return pages
+
+    def encode_cursor(self, number, direction, obj):
+        # Строки из .values() должны содержать поле и 'pk'.
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['pk']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        raw = f'{number}:{direction}:{pk}:{value.isoformat()}'
+        return urlsafe_base64_encode(force_bytes(raw))
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = force_str(urlsafe_base64_decode(cursor))
+            number, direction, pk, value = raw.split(':', 3)
+            number, pk = int(number), int(pk)
+            value = parse_datetime(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor('Некорректный курсор')
+        if value is None or number < 1:
+            raise InvalidCursor('Некорректный курсор')
+        if direction not in (FORWARD, BACKWARD):
+            raise InvalidCursor('Некорректный курсор')
+        return number, direction, pk, value
+
+    def page(self, cursor=None):
+        if cursor is None:
+            rows = list(self.object_list[:self.per_page + 1])
+            return self._make_page(rows[:self.per_page], 1,
+                                   len(rows) > self.per_page)
+        number, direction, pk, value = self.decode_cursor(cursor)
+        if direction == FORWARD:
+            rows = list(self.object_list.filter(
+                Q(**{f'{self.field}__lt': value})
+                | Q(**{self.field: value, 'pk__lt': pk})
+            )[:self.per_page + 1])
+            return self._make_page(rows[:self.per_page], number,
+                                   len(rows) > self.per_page)
+        rows = list(self.object_list.filter(
+            Q(**{f'{self.field}__gt': value})
+            | Q(**{self.field: value, 'pk__gt': pk})
+        ).reverse()[:self.per_page + 1])
+        if not rows:
+            return self.page()
+        if len(rows) <= self.per_page:
+            number = 1
+        elif number < 2:
+            number = 2
+        return self._make_page(rows[:self.per_page][::-1], number, True)
+
+    def page_number(self, number):
+        """Страница по номеру для старых ссылок вида `?page=N`."""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        offset = (number - 1) * self.per_page
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На странице нет результатов')
+        return self._make_page(rows[:self.per_page], number,
+                               len(rows) > self.per_page)
+
+    def get_page(self, cursor=None, number=None):
+        try:
+            if cursor:
+                return self.page(cursor)
+            if number:
+                return self.page_number(number)
+        except InvalidPage:
+            pass
+        return self.page()
+
+    def _make_page(self, items, number, has_next):
+        self.number = number
+        self.has_next = has_next
+        self.next_cursor = None
+        self.previous_cursor = None
+        if items and has_next:
+            self.next_cursor = self.encode_cursor(
+                number + 1, FORWARD, items[-1])
+        if items and number > 1:
+            self.previous_cursor = self.encode_cursor(
+                number - 1, BACKWARD, items[0])
+        return self._get_page(items, number, self)
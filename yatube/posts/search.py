@@ -0,0 +1,191 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Если в SQLite доступен FTS5, используется виртуальная таблица
+`posts_search_fts`, иначе — инвертированный индекс `SearchTerm`.
+В оба индекса попадают основы слов после русского стеммера, поэтому
+«книги» находит «книгами». Индекс обновляется сигналами при сохранении
+постов и комментариев. Результаты упорядочены по релевантности
+и листаются курсором по ключу (score, post_id).
+"""
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Comment, Post, SearchTerm
+from .stemmer import tokenize
+
+FTS_TABLE = 'posts_search_fts'
+TEXT_WEIGHT = 2
+COMMENT_WEIGHT = 1
+MAX_TERMS = 10
+BATCH_SIZE = 500
+
+
+class InvertedIndex:
+    """Индекс в обычной таблице, работает на любой базе."""
+
+    def index_post(self, post):
+        SearchTerm.objects.filter(post=post, comment=None).delete()
+        self._insert(post.text, post.pk, None, TEXT_WEIGHT)
+
+    def index_comment(self, comment):
+        SearchTerm.objects.filter(comment=comment).delete()
+        self._insert(comment.text, comment.post_id, comment.pk,
+                     COMMENT_WEIGHT)
+
+    def remove_post(self, post_id):
+        SearchTerm.objects.filter(post_id=post_id).delete()
+
+    def remove_comment(self, comment_id):
+        SearchTerm.objects.filter(comment_id=comment_id).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def _insert(self, text, post_id, comment_id, weight):
+        terms = Counter(term[:64] for term in tokenize(text))
+        SearchTerm.objects.bulk_create(
+            (SearchTerm(term=term, post_id=post_id, comment_id=comment_id,
+                        weight=count * weight)
+             for term, count in terms.items()),
+            batch_size=BATCH_SIZE
+        )
+
+    def search(self, terms, after, limit):
+        rows = (
+            SearchTerm.objects.filter(term__in=terms)
+            .values('post')
+            .annotate(score=Sum('weight'),
+                      matched=Count('term', distinct=True))
+            .filter(matched=len(terms))
+            .order_by('-score', '-post_id')
+        )
+        if after is not None:
+            score, post_id = after
+            rows = rows.filter(Q(score__lt=score)
+                               | Q(score=score, post_id__lt=post_id))
+        return [(row['post'], row['score']) for row in rows[:limit]]
+
+
+class FTS5Index:
+    """Индекс в виртуальной таблице SQLite FTS5 с ранжированием bm25.
+
+    Пост и каждый комментарий — отдельные документы, поэтому все слова
+    запроса должны встретиться в одном из них.
+    """
+
+    def index_post(self, post):
+        self._execute(
+            f'DELETE FROM {FTS_TABLE} WHERE post_id = %s '
+            'AND comment_id IS NULL', [post.pk]
+        )
+        self._execute(
+            f'INSERT INTO {FTS_TABLE} (text, comment, post_id, comment_id) '
+            "VALUES (%s, '', %s, NULL)",
+            [' '.join(tokenize(post.text)), post.pk]
+        )
+
+    def index_comment(self, comment):
+        self.remove_comment(comment.pk)
+        self._execute(
+            f'INSERT INTO {FTS_TABLE} (text, comment, post_id, comment_id) '
+            "VALUES ('', %s, %s, %s)",
+            [' '.join(tokenize(comment.text)), comment.post_id, comment.pk]
+        )
+
+    def remove_post(self, post_id):
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE post_id = %s',
+                      [post_id])
+
+    def remove_comment(self, comment_id):
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE comment_id = %s',
+                      [comment_id])
+
+    def clear(self):
+        self._execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, terms, after, limit):
+        match = ' '.join('"{}"'.format(term) for term in terms)
+        # bm25 нельзя вызывать внутри агрегата, поэтому ранг считается
+        # во вложенном запросе; LIMIT -1 не даёт SQLite его развернуть.
+        sql = (
+            'SELECT post_id, score FROM ('
+            'SELECT post_id, -MIN(rank) AS score FROM ('
+            f'SELECT post_id, bm25({FTS_TABLE}, {TEXT_WEIGHT}.0, '
+            f'{COMMENT_WEIGHT}.0) AS rank '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT -1'
+            ') GROUP BY post_id)'
+        )
+        params = [match]
+        if after is not None:
+            score, post_id = after
+            sql += ' WHERE score < %s OR (score = %s AND post_id < %s)'
+            params += [score, score, post_id]
+        sql += ' ORDER BY score DESC, post_id DESC LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+    def _execute(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+@lru_cache(maxsize=None)
+def _get_backend(name):
+    if name == 'auto':
+        name = ('fts5' if FTS_TABLE in connection.introspection.table_names()
+                else 'index')
+    return FTS5Index() if name == 'fts5' else InvertedIndex()
+
+
+def get_backend():
+    return _get_backend(settings.SEARCH_BACKEND)
+
+
+def encode_cursor(score, post_id):
+    return urlsafe_base64_encode(force_bytes(f'{score!r}:{post_id}'))
+
+
+def decode_cursor(cursor):
+    """Ключ (score, post_id) из курсора или None для неверного курсора."""
+    try:
+        score, post_id = force_str(urlsafe_base64_decode(cursor)).split(':')
+        return float(score), int(post_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def search(query, cursor=None, per_page=10):
+    """Посты по запросу, лучшие первыми, и курсор следующей страницы."""
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+    if not terms:
+        return [], None
+    after = decode_cursor(cursor) if cursor else None
+    rows = get_backend().search(terms, after, per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        post_id, score = rows[-1]
+        next_cursor = encode_cursor(score, post_id)
+    posts = Post.objects.for_listing().in_bulk(
+        [post_id for post_id, _ in rows]
+    )
+    found = [posts[post_id] for post_id, _ in rows if post_id in posts]
+    return found, next_cursor
+
+
+def rebuild():
+    """Переиндексирует все посты и комментарии."""
+    backend = get_backend()
+    backend.clear()
+    for post in Post.objects.only('pk', 'text').iterator():
+        backend.index_post(post)
+    comments = Comment.objects.exclude(post=None).only('pk', 'post', 'text')
+    for comment in comments.iterator():
+        backend.index_comment(comment)
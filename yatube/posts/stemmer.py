@@ -0,0 +1,115 @@
+"""Упрощённый стеммер Портера (Snowball) для русского языка."""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _regions(word):
+    """Начала областей RV и R2 по правилам Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _remove(word, groups):
+    """Убирает самое длинное окончание; окончания первой группы
+    снимаются только после `а` или `я`."""
+    first, second = groups
+    for ending in sorted(first + second, key=len, reverse=True):
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if ending in first and not stem.endswith(('а', 'я')):
+            return None
+        return stem
+    return None
+
+
+def _remove_inflection(word):
+    stemmed = _remove(word, PERFECTIVE_GERUND)
+    if stemmed is not None:
+        return stemmed
+    word = _remove(word, REFLEXIVE) or word
+    stemmed = _remove(word, ADJECTIVE)
+    if stemmed is not None:
+        return _remove(stemmed, PARTICIPLE) or stemmed
+    stemmed = _remove(word, VERB)
+    if stemmed is not None:
+        return stemmed
+    stemmed = _remove(word, NOUN)
+    return word if stemmed is None else stemmed
+
+
+def _tidy(word):
+    if word.endswith('нн'):
+        return word[:-1]
+    for ending in SUPERLATIVE:
+        if word.endswith(ending):
+            word = word[:-len(ending)]
+            break
+    if word.endswith(('нн', 'ь')):
+        return word[:-1]
+    return word
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+    prefix, word = word[:rv], _remove_inflection(word[rv:])
+    if word.endswith('и'):
+        word = word[:-1]
+    for ending in DERIVATIONAL:
+        if word.endswith(ending) and rv + len(word) - len(ending) >= r2:
+            word = word[:-len(ending)]
+            break
+    return prefix + _tidy(word)
+
+
+def tokenize(text):
+    """Основы слов текста в нижнем регистре."""
+    return [stem(word) for word in WORD_RE.findall(text.lower())]
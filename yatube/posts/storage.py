@@ -0,0 +1,95 @@
+"""Хранилище изображений постов с именами по содержимому.
+
+Имя файла — sha256 содержимого, а каталоги задают его первые символы:
+`posts/ab/cd/abcd….jpg`, чтобы в одном каталоге не копились тысячи
+файлов. Одинаковые загрузки получают одно имя, и файл второй раз
+не пишется, а sorl находит для него уже готовые миниатюры. Удалять
+такой файл можно только вместе с последней ссылкой на него,
+это делает `images.release` через `delete_unused`.
+
+Загрузка, получившая имя уже существующего файла, ещё не сослалась
+на него: пост сохранится позже. Поэтому она берёт в кэше аренду имени,
+а удаление сначала переименовывает файл и, если аренда есть, возвращает
+его на место. Аренду снимает `end_lease`, когда ссылка на файл
+сохранена в базе.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+LEASE_KEY = 'posts:storage:lease:{}'
+# Дольше не длится ни один запрос, который сохраняет пост.
+LEASE_TIMEOUT = 10 * 60
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        """Имя по хэшу содержимого в каталоге верхнего уровня из `name`."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        shards = [digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+                  for level in range(SHARD_LEVELS)]
+        prefix = name.split('/', 1)[0] if '/' in name else ''
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join(filter(None, [prefix, *shards, digest + extension]))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            cache.set(LEASE_KEY.format(name), True, LEASE_TIMEOUT)
+            # Если файл удалили до аренды, его нужно записать заново.
+            if self.exists(name):
+                return name
+        try:
+            saved = self._save(name, content)
+        except FileNotFoundError:
+            # Пустой каталог удалили одновременно с записью.
+            content.seek(0)
+            saved = self._save(name, content)
+        if saved != name:
+            # Тот же файл параллельно записал другой запрос.
+            self.delete(saved)
+        return name
+
+    def end_lease(self, *names):
+        """Снимает аренду имён, на которые теперь ссылается база."""
+        cache.delete_many([LEASE_KEY.format(name) for name in names])
+
+    def delete_unused(self, name, in_use):
+        """Удаляет файл, если он не арендован и `in_use(name)` ложно.
+
+        Возвращает True, если файл удалён.
+        """
+        path = self.path(name)
+        trash = f'{path}.{uuid.uuid4().hex}.deleted'
+        try:
+            os.rename(path, trash)
+        except FileNotFoundError:
+            return False
+        if cache.get(LEASE_KEY.format(name)) or in_use(name):
+            # Новая копия с тем же именем совпадает с этой по содержимому.
+            os.replace(trash, path)
+            return False
+        os.remove(trash)
+        directory = os.path.dirname(path)
+        for _ in range(SHARD_LEVELS):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+        return True
@@ -0,0 +1,15 @@
+from django import template
+
+from posts import images, thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    return thumbnails.thumbnail_url(image)
+
+
+@register.simple_tag
+def post_srcset(post):
+    return images.srcset(post)
@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import api
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.reader = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {i}')
+            for i in range(api.PER_PAGE + 3)
+        )
+        cls.post = Post.objects.create(author=cls.reader, text='Последний')
+        Comment.objects.create(post=cls.post, author=cls.author,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index_cursor_pages(self):
+        url = reverse('posts:api_index')
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), api.PER_PAGE)
+        self.assertEqual(first['results'][0]['text'], 'Последний')
+        self.assertEqual(first['results'][0]['author'], 'Reader')
+        second = self.client.get(url, {'cursor': first['next_cursor']}).json()
+        self.assertEqual(len(second['results']), 4)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_sparse_fieldsets(self):
+        response = self.client.get(reverse('posts:api_index'),
+                                   {'fields': 'id,text'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'text'})
+        response = self.client.get(reverse('posts:api_index'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_listings(self):
+        urls = {
+            reverse('posts:api_group_list', args=['group']): 20,
+            reverse('posts:api_profile', args=['Reader']): 1,
+            reverse('posts:api_post_comments', args=[self.post.pk]): 1,
+        }
+        for url, count in urls.items():
+            with self.subTest(url=url):
+                results = self.client.get(url).json()['results']
+                self.assertEqual(len(results), count)
+
+    def test_follow_requires_login(self):
+        url = reverse('posts:api_follow_index')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(response.has_header('ETag'))
+        self.client.force_login(self.reader)
+        results = self.client.get(url).json()['results']
+        self.assertEqual({post['author'] for post in results}, {'Author'})
+
+    def test_post_detail(self):
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        data = self.client.get(url).json()
+        self.assertEqual(data['comments_count'], 0)
+        self.assertEqual(data['text'], 'Последний')
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_conditional_get(self):
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Ещё пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_etag(self):
+        urls = [reverse('posts:api_index'),
+                reverse('posts:api_post_detail', args=[self.post.pk])]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.client.force_login(self.reader)
+        self.client.post(reverse('posts:add_comment', args=[self.post.pk]),
+                         data={'text': 'Ещё комментарий'})
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,46 @@
+from django.test import TestCase, TransactionTestCase
+
+from posts import benchmark
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_is_reproducible(self):
+        benchmark.seed(users=5, posts=20, groups=2, random_seed=1)
+        first = list(Post.objects.order_by('pk').values_list(
+            'author__username', 'text'))
+        follows = Follow.objects.count()
+        comments = Comment.objects.count()
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        benchmark.seed(users=5, posts=20, groups=2, random_seed=1)
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'author__username', 'text')), first)
+        self.assertEqual(Follow.objects.count(), follows)
+        self.assertEqual(Comment.objects.count(), comments)
+
+    def test_seed_without_comments(self):
+        benchmark.seed(users=3, posts=5, groups=1, comments_mean=0)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_run_reports_every_scenario(self):
+        benchmark.seed(users=5, posts=20, groups=2)
+        results = benchmark.run(requests=3, warmup=1)
+        self.assertEqual(set(results), set(benchmark.SCENARIOS))
+        for stats in results.values():
+            self.assertEqual(stats['requests'], 3)
+            self.assertGreater(stats['queries']['max'], 0)
+            self.assertLessEqual(stats['latency_ms']['p50'],
+                                 stats['latency_ms']['max'])
+
+
+class CompareHandlersTest(TransactionTestCase):
+    def test_wsgi_and_asgi_serve_same_requests(self):
+        benchmark.seed(users=3, posts=10, groups=1)
+        results = benchmark.compare_handlers(requests=4, concurrency=2)
+        self.assertEqual(set(results), set(benchmark.READ_SCENARIOS))
+        for handlers in results.values():
+            self.assertEqual(set(handlers), {'wsgi', 'asgi'})
+            self.assertEqual(handlers['asgi']['requests'], 4)
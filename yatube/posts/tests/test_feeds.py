@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание группы')
+        Post.objects.create(author=cls.author, group=cls.group,
+                            text='Пост в группе')
+        Post.objects.create(author=User.objects.create(username='Other'),
+                            text='Пост без группы')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_contain_posts(self):
+        grouped, other = 'Пост в группе', 'Пост без группы'
+        feeds = {
+            reverse('posts:posts_rss'): (grouped, other),
+            reverse('posts:posts_atom'): (grouped, other),
+            reverse('posts:group_rss', args=['group']): (grouped,),
+            reverse('posts:group_atom', args=['group']): (grouped,),
+            reverse('posts:profile_rss', args=['Other']): (other,),
+            reverse('posts:profile_atom', args=['Author']): (grouped,),
+        }
+        for url, texts in feeds.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode()
+                for text in (grouped, other):
+                    self.assertEqual(text in content, text in texts)
+
+    def test_unknown_group_feed(self):
+        response = self.client.get(reverse('posts:group_rss', args=['no']),
+                                   HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_cache_is_per_host(self):
+        url = reverse('posts:posts_rss')
+        self.client.get(url, HTTP_HOST='evil.example')
+        response = self.client.get(url, HTTP_HOST='yatube.example')
+        self.assertContains(response, 'http://yatube.example/')
+        self.assertNotContains(response, 'evil.example')
+
+    def test_conditional_requests(self):
+        url = reverse('posts:group_atom', args=['group'])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, 'Новый пост')
@@ -0,0 +1,83 @@
+from array import array
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counters, follow_graph
+from posts.models import Follow, Post, User
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Reader')
+        cls.authors = [User.objects.create(username=f'Author{number}')
+                       for number in range(3)]
+        for author in cls.authors[::-1]:
+            Follow.objects.create(user=cls.user, author=author)
+        counters.reconcile()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_following_ids_sorted_and_cached(self):
+        ids = follow_graph.following_ids(self.user.pk)
+        self.assertEqual(list(ids), sorted(a.pk for a in self.authors))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(
+                self.user.pk, self.authors[1].pk))
+            self.assertFalse(follow_graph.is_following(
+                self.user.pk, self.user.pk))
+
+    def test_clear_reloads_from_database(self):
+        follow_graph.following_ids(self.user.pk)
+        Follow.objects.filter(author=self.authors[0]).delete()
+        follow_graph.clear()
+        self.assertFalse(follow_graph.is_following(
+            self.user.pk, self.authors[0].pk))
+
+    def test_views_do_not_query_follow_table(self):
+        client = Client()
+        client.force_login(self.user)
+        Post.objects.create(author=self.authors[0], text='Пост')
+        follow_graph.following_ids(self.user.pk)
+        urls = (reverse('posts:follow_index'),
+                reverse('posts:profile', args=[self.authors[0].username]))
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as captured:
+                    response = client.get(url)
+                self.assertFalse(any('posts_follow' in query['sql']
+                                     for query in captured))
+        self.assertTrue(response.context['following'])
+
+
+class FollowGraphUpdateTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_views_update_cached_set(self):
+        user = User.objects.create(username='Reader')
+        author = User.objects.create(username='Author')
+        client = Client()
+        client.force_login(user)
+        self.assertFalse(follow_graph.is_following(user.pk, author.pk))
+        client.get(reverse('posts:profile_follow', args=[author.username]))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(user.pk, author.pk))
+        client.get(reverse('posts:profile_unfollow', args=[author.username]))
+        with self.assertNumQueries(0):
+            self.assertFalse(follow_graph.is_following(user.pk, author.pk))
+
+    def test_set_read_before_commit_is_not_served(self):
+        user = User.objects.create(username='Reader')
+        author = User.objects.create(username='Author')
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+            # Так массив сохранил бы запрос, прочитавший базу до коммита.
+            cache.set(follow_graph._following_key(user.pk),
+                      array(follow_graph.TYPECODE), 60)
+        self.assertTrue(follow_graph.is_following(user.pk, author.pk))
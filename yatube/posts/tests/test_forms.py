@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -68,12 +69,13 @@ class PostFormTests(TestCase):
                              reverse('posts:profile',
                                      kwargs={'username': 'Name'}))
         self.assertEqual(Post.objects.count(), post_count + 1)
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 group='1',
                 text='Текст',
                 author=self.user,
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
             ).exists()
         )
 
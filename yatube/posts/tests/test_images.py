@@ -0,0 +1,142 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post, ThumbnailJob, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_upload(size, name='photo.jpg', image_format='JPEG', **params):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, image_format,
+                                               **params)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type=f'image/{image_format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create(username='Author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, upload):
+        return self.client.post(reverse('posts:post_create'),
+                                {'text': 'С картинкой', 'image': upload})
+
+    def test_large_image_is_resized_without_metadata(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        self.create_post(make_upload((3000, 300), exif=exif.tobytes()))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.width, settings.IMAGE_MAX_WIDTH)
+            self.assertNotIn('exif', image.info)
+        widths = [candidate.rsplit(' ', 1)[1]
+                  for candidate in post.image_srcset.split(', ')]
+        self.assertEqual(widths, ['480w', '960w', '1440w', '1920w'])
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'srcset="/media/posts/')
+
+    def test_rotated_image_keeps_resolution(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        self.create_post(make_upload((4000, 400), exif=exif.tobytes()))
+        with Image.open(Post.objects.get().image.path) as image:
+            self.assertEqual(image.size, (400, 4000))
+
+    def test_small_image_without_metadata_is_kept(self):
+        upload = make_upload((40, 40), 'tiny.png', 'PNG')
+        digest = hashlib.sha256(upload.read()).hexdigest()
+        upload.seek(0)
+        self.create_post(upload)
+        post = Post.objects.get()
+        self.assertEqual(post.image.name,
+                         f'posts/{digest[:2]}/{digest[2:4]}/{digest}.png')
+        self.assertEqual(post.image_srcset, '')
+
+    @override_settings(IMAGE_MAX_DIMENSION=100)
+    def test_too_large_dimensions_rejected(self):
+        response = self.create_post(make_upload((101, 10)))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение больше 100 пикселей по стороне')
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SharedImageTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='Author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, upload):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'С картинкой', 'image': upload})
+        return Post.objects.latest('pk')
+
+    def test_identical_uploads_share_file_until_last_post_deleted(self):
+        first = self.create_post(make_upload((1000, 100)))
+        second = self.create_post(make_upload((1000, 100), 'copy.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_srcset, second.image_srcset)
+        path = first.image.path
+        variants = [os.path.join(settings.MEDIA_ROOT, candidate.split()[0])
+                    for candidate in first.image_srcset.split(', ')]
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        for variant in variants:
+            self.assertFalse(os.path.exists(variant))
+        self.assertFalse(ThumbnailJob.objects.exists())
+        # Пустые каталоги шардов удаляются вместе с файлом.
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+
+    def test_file_handed_to_new_upload_survives_release(self):
+        post = self.create_post(make_upload((1000, 100)))
+        path = post.image.path
+        with open(path, 'rb') as source:
+            content = ContentFile(source.read())
+        # Новая загрузка получила имя, но её пост ещё не сохранён.
+        self.assertEqual(post.image.storage.save('posts/copy.jpg', content),
+                         post.image.name)
+        post.delete()
+        self.assertTrue(os.path.exists(path))
+
+    def test_variant_shared_with_other_post_image_is_kept(self):
+        first = self.create_post(make_upload((1000, 100)))
+        variant = first.image_srcset.split(', ')[0].split()[0]
+        second = Post.objects.create(author=self.user, text='Копия',
+                                     image=variant)
+        path = second.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, SearchTerm
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        forms = (
+            ('книга', 'книги', 'книгами'),
+            ('красивая', 'красивые', 'красивого'),
+            ('ёлка', 'елки'),
+        )
+        for words in forms:
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+
+class SearchTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Name')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Новые книги о красивых городах')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Книга, книга и ещё раз книга')
+        Post.objects.create(author=cls.user, text='Совсем про другое')
+        cls.comment = Comment.objects.create(
+            post=cls.other, author=cls.user, text='Отличный обзор городов')
+
+    def setUp(self):
+        self.client = Client()
+
+    def get_posts(self, query, cursor=None):
+        params = {'q': query}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(reverse('posts:search'), params)
+        return response.context['posts'], response.context['next_cursor']
+
+    def test_search_uses_stems_and_rank(self):
+        posts, _ = self.get_posts('книгами')
+        self.assertEqual(posts, [self.other, self.post])
+
+    def test_search_includes_comments(self):
+        posts, _ = self.get_posts('город')
+        self.assertEqual(set(posts), {self.post, self.other})
+
+    def test_index_follows_edits(self):
+        self.comment.delete()
+        self.post.text = 'Пусто'
+        self.post.save()
+        posts, _ = self.get_posts('город')
+        self.assertEqual(posts, [])
+
+    def test_keyset_pages(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Город {i}') for i in range(12)
+        )
+        search.rebuild()
+        found = []
+        posts, cursor = self.get_posts('город')
+        found += posts
+        self.assertEqual(len(posts), 10)
+        posts, cursor = self.get_posts('город', cursor)
+        found += posts
+        self.assertIsNone(cursor)
+        self.assertEqual(len(found), 14)
+        self.assertEqual(len(set(found)), 14)
+
+    def test_empty_query(self):
+        posts, cursor = self.get_posts('  ')
+        self.assertEqual(posts, [])
+        self.assertIsNone(cursor)
+
+
+@override_settings(SEARCH_BACKEND='fts5')
+class FTS5SearchTest(SearchTestMixin, TestCase):
+    pass
+
+
+@override_settings(SEARCH_BACKEND='index')
+class InvertedIndexSearchTest(SearchTestMixin, TestCase):
+    def test_terms_stored(self):
+        self.assertTrue(SearchTerm.objects.filter(
+            post=self.post, term=stem('книги')).exists())
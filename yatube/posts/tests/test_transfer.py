@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        author = User.objects.create(username='Author')
+        reader = User.objects.create(username='Reader')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        post = Post.objects.create(author=author, group=group,
+                                   text='Первый пост')
+        Post.objects.filter(pk=post.pk).update(pub_date=timezone.make_aware(
+            datetime(2020, 1, 2, 3, 4, 5)))
+        Post.objects.create(author=reader, text='Второй пост')
+        Comment.objects.create(post=post, author=reader, text='Комментарий')
+        Follow.objects.create(user=reader, author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def round_trip(self, name):
+        path = os.path.join(self.directory, name)
+        call_command('export_posts', path, stderr=StringIO())
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.filter(username='Reader').delete()
+        call_command('import_posts', path, batch_size=2, stdout=StringIO())
+
+    def assert_restored(self):
+        post = Post.objects.get(text='Первый пост')
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().author.username, 'Reader')
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertTrue(Follow.objects.filter(
+            user__username='Reader', author__username='Author').exists())
+        stats = UserStats.objects.get(user__username='Author')
+        self.assertEqual((stats.posts_count, stats.followers_count), (1, 1))
+
+    def test_jsonl_round_trip(self):
+        self.round_trip('posts.jsonl')
+        self.assert_restored()
+
+    def test_csv_round_trip(self):
+        self.round_trip('posts.csv')
+        self.assert_restored()
+
+    def test_import_next_to_existing_posts(self):
+        path = os.path.join(self.directory, 'copy.jsonl')
+        call_command('export_posts', path, stderr=StringIO())
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            Post.objects.filter(text='Первый пост', comments_count=1).count(),
+            2
+        )
+
+    def test_import_from_stdin_counts_skipped_rows(self):
+        lines = (
+            '{"type": "post", "id": 1, "author": "Author", "text": "Пост"}\n'
+            '{"type": "comment", "post": 1, "author": "Reader", '
+            '"text": "Есть"}\n'
+            '{"type": "comment", "post": 99, "author": "Reader", '
+            '"text": "Нет поста"}\n'
+            '{"type": "follow", "user": "Reader", "author": "Reader"}\n'
+        )
+        stdin, stdout = StringIO(lines), StringIO()
+        with mock.patch('sys.stdin', stdin):
+            call_command('import_posts', '-', stdout=stdout)
+        self.assertFalse(stdin.closed)
+        self.assertEqual(Comment.objects.filter(text='Нет поста').count(), 0)
+        self.assertIn('пропущено: 2', stdout.getvalue())
@@ -1,14 +1,20 @@
+from io import StringIO
 import shutil
 import tempfile
 from django.conf import settings
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from posts.models import Post, Group, Follow
+from posts import comments, counters, feed, thumbnails
+from posts.pagination import CursorPaginator
+from posts.models import (Comment, FeedCelebrity, FeedEntry, Follow, Group,
+                          Post, ThumbnailJob, UserStats)
 
 
 User = get_user_model()
@@ -186,15 +192,51 @@ class PostPagesTest(TestCase):
             reverse('posts:profile', kwargs={'username': self.user}))
         self.assertEqual(len(response.context['page_obj']), 2)
 
+    def test_thumbnail_prepared_outside_request(self):
+        cache.clear()
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post_id})
+        response = self.authorized_client.get(url)
+        self.assertContains(response, f'src="{self.post.image.url}"')
+        self.assertTrue(ThumbnailJob.objects.filter(
+            image=self.post.image.name).exists())
+        call_command('process_thumbnails', stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exists())
+        response = self.authorized_client.get(url)
+        self.assertNotContains(response, f'src="{self.post.image.url}"')
+
+    def test_listing_shows_thumbnail_after_processing(self):
+        cache.clear()
+        url = reverse('posts:index')
+        clients = (self.client, self.authorized_client)
+        for client in clients:
+            self.assertContains(client.get(url),
+                                f'src="{self.post.image.url}"')
+        thumbnails.process()
+        for client in clients:
+            with self.subTest(authorized=client is self.authorized_client):
+                response = client.get(url)
+                self.assertNotContains(response,
+                                       f'src="{self.post.image.url}"')
+                self.assertContains(response, 'src="/media/cache/')
+
     def test_cache_home_page(self):
         response = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.all().delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, response_2.content)
         cache.clear()
         response_3 = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, response_3.content)
 
+    def test_cache_invalidated_on_change(self):
+        response = self.authorized_client.get(reverse('posts:index'))
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        response_2 = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response.content, response_2.content)
+        post.delete()
+        response_3 = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn('Новый пост', response_3.content.decode())
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -235,6 +277,116 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']), posts)
 
 
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='UserName')
+        Post.objects.bulk_create(
+            Post(text=f'Текст {i}', author=cls.user) for i in range(23)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_page(self, query=''):
+        response = self.client.get(reverse('posts:index') + query)
+        return response.context['page_obj']
+
+    def test_pages_cached_separately(self):
+        page = self.get_page()
+        response = self.client.get(
+            reverse('posts:index') + '?cursor=' + page.paginator.next_cursor)
+        self.assertIn('Текст 12', response.content.decode())
+        self.assertNotIn('Текст 13', response.content.decode())
+
+    def test_cursor_pages(self):
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        page = self.get_page()
+        self.assertEqual(list(page), expected[:10])
+        self.assertFalse(page.has_previous())
+        page = self.get_page('?cursor=' + page.paginator.next_cursor)
+        self.assertEqual(list(page), expected[10:20])
+        self.assertEqual(page.number, 2)
+        page = self.get_page('?cursor=' + page.paginator.next_cursor)
+        self.assertEqual(list(page), expected[20:])
+        self.assertFalse(page.has_next())
+        page = self.get_page('?cursor=' + page.paginator.previous_cursor)
+        self.assertEqual(list(page), expected[10:20])
+        page = self.get_page('?cursor=' + page.paginator.previous_cursor)
+        self.assertEqual(list(page), expected[:10])
+        self.assertEqual(page.number, 1)
+
+    def test_legacy_page_number(self):
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        page = self.get_page('?page=3')
+        self.assertEqual(list(page), expected[20:])
+        self.assertEqual(page.number, 3)
+        page = self.get_page('?cursor=' + page.paginator.previous_cursor)
+        self.assertEqual(list(page), expected[10:20])
+
+    def test_invalid_cursor_returns_first_page(self):
+        for query in ('?cursor=broken', '?page=abc', '?page=100'):
+            with self.subTest(query=query):
+                page = self.get_page(query)
+                self.assertEqual(page.number, 1)
+                self.assertEqual(len(page), 10)
+
+
+class ListingQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(
+            title='Test',
+            description='Test_Group',
+            slug='text-slug'
+        )
+        for i in range(12):
+            author = User.objects.create(username=f'Author{i}',
+                                         first_name=f'Имя{i}')
+            Post.objects.create(text=f'Текст {i}', author=author,
+                                group=cls.group)
+            Follow.objects.create(user=cls.user, author=author)
+        counters.reconcile()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_listing_query_count(self):
+        author = Post.objects.first().author
+        # Для анонима к запросам страницы добавляется время самой новой
+        # записи для Last-Modified.
+        pages = {
+            reverse('posts:index'): 2,
+            reverse('posts:group_list', kwargs={'slug': 'text-slug'}): 3,
+            reverse('posts:profile', kwargs={'username': author}): 3,
+        }
+        for url, queries in pages.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    self.client.get(url)
+        # Сессия читается из кэша, подписки читаются из базы один раз.
+        with self.assertNumQueries(3):
+            self.authorized_client.get(reverse('posts:follow_index'))
+        with self.assertNumQueries(2):
+            self.authorized_client.get(reverse('posts:follow_index'),
+                                       {'page': 2})
+
+    def test_windowed_page_range(self):
+        paginator = CursorPaginator(Post.objects.all(), 1)
+        paginator.page_number(5)
+        self.assertEqual(paginator.elided_page_range, [1, '…', 4, 5, 6])
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.num_pages, 6)
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertNotContains(response, '?page=')
+
+
 class FollowViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -243,6 +395,7 @@ class FollowViewsTest(TestCase):
         cls.user = User.objects.create(username='User')
 
     def setUp(self):
+        cache.clear()
         self.follower = Client()
         self.Author = Client()
         self.follower.force_login(self.user)
@@ -258,6 +411,24 @@ class FollowViewsTest(TestCase):
         )
         self.assertEqual(count + 1, Follow.objects.count())
 
+    def test_follow_twice(self):
+        url = reverse('posts:profile_follow',
+                      kwargs={'username': self.author})
+        self.follower.get(url)
+        self.follower.get(url)
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=self.author).count(),
+            1
+        )
+
+    def test_follow_constraints(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        for user, author in ((self.user, self.author), (self.user, self.user)):
+            with self.subTest(author=author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(user=user, author=author)
+
     def test_unfollow(self):
         count = Follow.objects.count()
         self.follower.get(
@@ -282,3 +453,229 @@ class FollowViewsTest(TestCase):
             'posts:follow_index'
         ))
         self.assertNotIn(post, response.context['page_obj'])
+
+
+@override_settings(FEED_FANOUT=True, FEED_CELEBRITY_FOLLOWERS=100)
+class FeedFanoutTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.user = User.objects.create(username='User')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        cache.clear()
+        self.follower = Client()
+        self.follower.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def get_feed(self):
+        response = self.follower.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.follower.get(reverse('posts:profile_follow',
+                                  kwargs={'username': self.author}))
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=self.old_post).exists())
+        self.assertEqual(self.get_feed(), [self.old_post])
+        self.follower.get(reverse('posts:profile_unfollow',
+                                  kwargs={'username': self.author}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.get_feed(), [])
+
+    def test_new_post_fans_out(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        self.author_client.post(reverse('posts:post_create'),
+                                data={'text': 'Новый'})
+        post = Post.objects.get(text='Новый')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=post).exists())
+        self.assertIn(post, self.get_feed())
+
+    @override_settings(FEED_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_read_at_request_time(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(feed.refresh_celebrities(), (1, 0))
+        self.author_client.post(reverse('posts:post_create'),
+                                data={'text': 'Новый'})
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(len(self.get_feed()), 2)
+
+    def test_former_celebrity_posts_fan_out(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        with override_settings(FEED_CELEBRITY_FOLLOWERS=1):
+            feed.refresh_celebrities()
+            self.author_client.post(reverse('posts:post_create'),
+                                    data={'text': 'Новый'})
+        # Множество популярных авторов переживает очистку кэша,
+        # а запрос ленты не раздаёт посты выбывших.
+        cache.clear()
+        self.assertEqual(len(self.get_feed()), 2)
+        self.assertFalse(FeedEntry.objects.exists())
+        call_command('rebuild_feeds', '--celebrities', stdout=StringIO())
+        self.assertFalse(FeedCelebrity.objects.exists())
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(len(self.get_feed()), 2)
+
+    @override_settings(FEED_CELEBRITY_FOLLOWERS=5)
+    def test_celebrity_near_threshold_is_kept(self):
+        for number in range(5):
+            Follow.objects.create(
+                user=User.objects.create(username=f'Follower{number}'),
+                author=self.author)
+        self.assertEqual(feed.refresh_celebrities(), (1, 0))
+        Follow.objects.filter(user__username='Follower0').delete()
+        self.assertEqual(feed.refresh_celebrities(), (0, 0))
+        Follow.objects.filter(user__username='Follower1').delete()
+        self.assertEqual(feed.refresh_celebrities(), (0, 1))
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.get_feed(), [self.old_post])
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.user = User.objects.create(username='User')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        self.client.post(reverse('posts:post_create'), data={'text': 'Пост'})
+        self.assertEqual(self.get_stats(self.user).posts_count, 1)
+        self.client.post(reverse('posts:add_comment',
+                                 kwargs={'post_id': self.post.id}),
+                         data={'text': 'Комментарий'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_follow_counters(self):
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author}))
+        self.assertEqual(self.get_stats(self.user).following_count, 1)
+        self.assertEqual(self.get_stats(self.author).followers_count, 1)
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author}))
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author}))
+        self.assertEqual(self.get_stats(self.user).following_count, 0)
+        self.assertEqual(self.get_stats(self.author).followers_count, 0)
+
+    def test_reconcile_command(self):
+        UserStats.objects.create(user=self.author, posts_count=5)
+        Comment.objects.create(post=self.post, author=self.user, text='Т')
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+        self.assertEqual(self.get_stats(self.user).posts_count, 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='User')
+        cls.post = Post.objects.create(author=cls.user, text='Текст')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(comments.PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_first_page_and_more_link(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        page = response.context['comments']
+        self.assertEqual(len(page), comments.PER_PAGE)
+        self.assertTrue(page.has_next)
+        self.assertContains(response, 'Показать ещё')
+
+    def test_fragment_endpoint_pages(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        first = self.client.get(url, {'format': 'json'}).json()
+        self.assertEqual(len(first['comments']), comments.PER_PAGE)
+        second = self.client.get(url, {'cursor': first['next_cursor']})
+        self.assertEqual(len(second.context['comments']), 5)
+        self.assertNotContains(second, 'Показать ещё')
+        response = self.client.get(reverse('posts:post_comments',
+                                           kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_page_skips_comment_queries(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_add_comment_invalidates_cache(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        self.client.get(url, {'format': 'json'})
+        self.client.post(reverse('posts:add_comment',
+                                 kwargs={'post_id': self.post.id}),
+                         data={'text': 'Самый новый'})
+        data = self.client.get(url, {'format': 'json'}).json()
+        self.assertEqual(data['comments'][0]['text'], 'Самый новый')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Author')
+        cls.post = Post.objects.create(author=cls.user, text='Текст поста')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_page_without_queries(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        first = self.client.get(url)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+
+    def test_conditional_get(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_comment_changes_etag(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Новый комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_authorized_user_bypasses_cache(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('ETag', response)
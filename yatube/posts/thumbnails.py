@@ -0,0 +1,96 @@
+"""Миниатюры изображений постов, которые готовятся вне запроса.
+
+Вьюхи ставят изображение в очередь `ThumbnailJob`, команда
+`process_thumbnails` её разбирает. Пока миниатюры нет, шаблоны
+показывают оригинал и сами не декодируют изображение. Готовые
+миниатюры сбрасывают кэш лент, иначе закэшированные страницы
+ещё долго ссылались бы на оригиналы.
+"""
+import logging
+
+from django.core.cache import cache
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import ImageFile
+
+from . import fragments
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+MAX_ATTEMPTS = 3
+QUEUED_CACHE_KEY = 'posts:thumbnail:queued:{}'
+QUEUED_CACHE_TIMEOUT = 60 * 60
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей sorl или None."""
+        source = ImageFile(file_)
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = ReadyThumbnailBackend()
+
+
+def schedule(image):
+    """Ставит изображение в очередь на создание миниатюры."""
+    if not image:
+        return
+    if cache.add(QUEUED_CACHE_KEY.format(image.name), True,
+                 QUEUED_CACHE_TIMEOUT):
+        ThumbnailJob.objects.bulk_create(
+            [ThumbnailJob(image=image.name)], ignore_conflicts=True
+        )
+
+
+def thumbnail_url(image):
+    """URL готовой миниатюры, а пока её нет — URL оригинала."""
+    if not image:
+        return ''
+    thumbnail = backend.get_ready_thumbnail(image, GEOMETRY, **OPTIONS)
+    if thumbnail:
+        return thumbnail.url
+    schedule(image)
+    return image.url
+
+
+def process(limit=None):
+    """Создаёт миниатюры из очереди, возвращает число готовых."""
+    storage = Post._meta.get_field('image').storage
+    jobs = ThumbnailJob.objects.all()
+    if limit:
+        jobs = jobs[:limit]
+    done = 0
+    for job in jobs:
+        source = ImageFile(job.image, storage)
+        try:
+            backend.get_thumbnail(source, GEOMETRY, **OPTIONS)
+            ready = backend.get_ready_thumbnail(source, GEOMETRY, **OPTIONS)
+        except Exception:
+            logger.exception('Не удалось создать миниатюру %s', job.image)
+            ready = None
+        if ready:
+            done += 1
+        else:
+            job.attempts += 1
+            if job.attempts < MAX_ATTEMPTS:
+                job.save(update_fields=['attempts'])
+                continue
+        job.delete()
+    if done:
+        fragments.bump(fragments.POSTS)
+    return done
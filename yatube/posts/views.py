@@ -1,71 +1,129 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
 from django.shortcuts import redirect
+from . import (comments, counters, feed, follow_graph, fragments, images,
+               page_cache, search, thumbnails)
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
+from .models import Comment, Post, Group, User, Follow
+from .pagination import CursorPaginator
 
 
 # Главная страница.
 
 def paginator(request, posts):
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, 10)
+    page_obj = paginator.get_page(
+        cursor=request.GET.get('cursor'),
+        number=request.GET.get('page')
+    )
     return page_obj
 
 
+@page_cache.anonymous_page(
+    lambda: page_cache.newest(Post.objects.all())
+)
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.all()
+    posts = Post.objects.for_listing()
     page_obj = paginator(request, posts)
     context = {
         'page_obj': page_obj,
+        'fragment_key': fragments.fragment_key(request, fragments.POSTS),
     }
     return render(request, template, context)
 
 
+@page_cache.anonymous_page(
+    lambda slug: page_cache.newest(Post.objects.filter(group__slug=slug))
+)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_listing()
     page_obj = paginator(request, posts)
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'fragment_key': fragments.fragment_key(request, fragments.POSTS),
     }
     return render(request, template, context)
 
 
+@page_cache.anonymous_page(
+    lambda username: page_cache.newest(
+        Post.objects.filter(author__username=username))
+)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    posts = author.posts.for_listing()
+    author_stats = counters.get_stats(author)
     page_obj = paginator(request, posts)
     context = {
         'page_obj': page_obj,
         'author': author,
+        'author_stats': author_stats,
+        'fragment_key': fragments.fragment_key(request, fragments.POSTS),
     }
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists
-        context['following'] = following
+        context['following'] = follow_graph.is_following(
+            request.user.pk, author.pk)
         return render(request, template, context)
     # Здесь код запроса к модели и создание словаря контекста
     return render(request, template, context)
 
 
+@page_cache.anonymous_page(
+    lambda post_id: max(filter(None, (
+        page_cache.newest(Post.objects.filter(pk=post_id)),
+        page_cache.newest(Comment.objects.filter(post_id=post_id),
+                          'created'),
+    )), default=None),
+    lambda post_id: [fragments.comments_scope(post_id)]
+)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
     # Здесь код запроса к модели и создание словаря контекста
-    posts = get_object_or_404(Post, pk=post_id)
+    posts = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = posts.comments.all()
     context = {
         'posts': posts,
         'form': form,
-        'comments': comments
+        'comments': comments.lazy_page(posts.pk, request.GET.get('cursor')),
+        'comments_key': comments.cache_key(request, posts.pk),
+        'author_stats': counters.get_stats(posts.author),
+    }
+    return render(request, template, context)
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или JSON."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(comments.as_json(request, post_id))
+    context = {
+        'post_id': post_id,
+        'comments': comments.lazy_page(post_id, request.GET.get('cursor')),
+        'comments_key': comments.cache_key(request, post_id),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    posts, next_cursor = search.search(query, cursor)
+    context = {
+        'query': query,
+        'posts': posts,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
     }
     return render(request, template, context)
 
@@ -80,6 +138,11 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            counters.change_user(request.user, posts_count=1)
+            feed.fan_out(post)
+            if post.image:
+                images.save_variants(post)
+                thumbnails.schedule(post.image)
             return redirect('posts:profile', username=post.author)
         return render(request, template, {'form': form})
     form = PostForm()
@@ -92,11 +155,16 @@ def post_edit(request, post_id):
     posts = get_object_or_404(Post, id=post_id)
     if request.user != posts.author:
         return redirect('posts:post_detail', post_id)
+    old_image = posts.image.name, posts.image_srcset
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
                     instance=posts)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            images.save_variants(post)
+            thumbnails.schedule(post.image)
+            images.release(*old_image)
         return redirect('posts:post_detail', post_id)
     context = {
         'is_edit': True,
@@ -114,16 +182,21 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        counters.change_post(post, comments_count=1)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, posts)
+    posts = feed.feed_posts(request.user)
+    page_obj = paginator(request, posts.for_listing())
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'fragment_key': fragments.fragment_key(
+            request, fragments.POSTS,
+            fragments.follow_scope(request.user.pk)
+        ),
     }
     return render(request, template, context)
 
@@ -132,14 +205,26 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        if not Follow.objects.filter(author=author,
-                                     user=request.user).exists():
-            Follow.objects.create(author_id=author.id, user_id=request.user.id)
+        try:
+            with transaction.atomic():
+                Follow.objects.create(author=author, user=request.user)
+        except IntegrityError:
+            pass
+        else:
+            counters.change_user(request.user, following_count=1)
+            counters.change_user(author, followers_count=1)
+            feed.backfill(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    deleted, _ = Follow.objects.filter(
+        user=request.user, author=author
+    ).delete()
+    if deleted:
+        counters.change_user(request.user, following_count=-1)
+        counters.change_user(author, followers_count=-1)
+        feed.prune(request.user, author)
     return redirect('posts:profile', username=username)
@@ -1,4 +1,5 @@
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -33,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,11 +49,15 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+BASE_TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -59,12 +66,26 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
             ],
+            # Без отладки шаблоны читаются и разбираются один раз
+            # на процесс, вместе со вставленными через {% partial %}.
+            'loaders': BASE_TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader',
+                 BASE_TEMPLATE_LOADERS),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Сессии читаются из кэша, а база нужна только при промахе;
+# анонимные сессии хранятся в подписанной cookie (core/sessions.py).
+SESSION_ENGINE = 'core.sessions'
+SESSION_ANONYMOUS_SIGNED_COOKIE = True
+
+# Потоков для синхронных вьюх за ASGI-сервером (yatube/asgi.py).
+ASGI_THREADS = 8
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -73,9 +94,43 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Реплики только для чтения. Пока список пуст, все запросы идут
+# в основную базу.
+DATABASE_REPLICAS = []
+# Псевдоним объявляем, только если реплика нужна: иначе check
+# и makemigrations создают пустой файл базы. Тесты маршрутизации
+# читают из отдельной пустой реплики.
+if DATABASE_REPLICAS or sys.argv[1:2] == ['test']:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.replica.sqlite3'),
+        },
+    }
+# Вьюхи, которые только читают и могут обращаться к репликам.
+REPLICA_VIEWS = [
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'posts:api_index',
+    'posts:api_group_list',
+    'posts:api_profile',
+    'posts:api_follow_index',
+    'posts:api_post_detail',
+    'posts:api_post_comments',
+    'about:author',
+    'about:tech',
+]
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -131,8 +186,54 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки сразу пишутся во временный файл, а не держатся в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Изображения постов: пределы загрузки, ширина хранимого изображения,
+# ширины копий для srcset и качество перекодирования.
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_DIMENSION = 10000
+IMAGE_MAX_WIDTH = 1920
+IMAGE_WIDTHS = (480, 960, 1440)
+IMAGE_QUALITY = 80
+
+# Кэш в два уровня: память процесса и общий для всех процессов
+# бэкенд `shared`. В разработке сервер один, и общим уровнем служит
+# память; в бою — файлы на общем диске или Redis
+# ('django_redis.cache.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1').
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            # Чужие записи доходят до памяти процесса за столько секунд.
+            'POLL_INTERVAL': 1,
+            'LOCAL_TIMEOUT': 60,
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'shared',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    } if DEBUG else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        # Каждый ключ второго уровня лежит рядом со своей меткой записи.
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
 }
+
+# Лента подписок: раздача постов подписчикам при публикации.
+FEED_FANOUT = False
+# Посты авторов с таким числом подписчиков читаются при запросе.
+FEED_CELEBRITY_FOLLOWERS = 1000
+
+# Поиск: 'fts5', 'index' (таблица SearchTerm) или 'auto' — FTS5, если есть.
+SEARCH_BACKEND = 'auto'
+
+# Замеры производительности: доля запросов в выборке и размер окна.
+PERF_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+PERF_WINDOW = 1000
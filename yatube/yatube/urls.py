@@ -8,7 +8,8 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('admin/', admin.site.urls),
     path('auth/', include('django.contrib.auth.urls')),
-    path('about/', include('about.urls', namespace='about'))
+    path('about/', include('about.urls', namespace='about')),
+    path('perf/', include('core.urls', namespace='core')),
 ]
 
 handler404 = 'core.views.page_not_found'